@@ -1,33 +1,40 @@
 import aiohttp
 
+from libs.apiclient import ApiClient
+
 class ErrorCollection(Exception):
     def __init__(self, errors):
         self.errors = errors
 
 # @TODO: Fazer com que APIs retornem seus próprios objetos
-class AniListApi:
-    def __init__(self, aiohttpSession: aiohttp.ClientSession):
-        self.session = aiohttpSession
-        self.domain = r'https://graphql.anilist.co'
+class AniListApi(ApiClient):
+    CACHE_TTLS = {
+        'search_characters': (300, 900)
+    }
+
+    def __init__(self, aiohttpSession: aiohttp.ClientSession, cache=None, limiter=None):
+        super().__init__('anilist', r'https://graphql.anilist.co', aiohttpSession, cache=cache, limiter=limiter)
 
-    async def send_request(self, query, variables={}):
-        json = None
+    async def send_request(self, method: str, url: str, params: dict=None, body: dict=None):
+        data, cacheable = await super().send_request(method, url, params, body)
+        # O GraphQL também pode retornar erros com status 200, eles não devem ficar no cache.
+        return data, cacheable and 'errors' not in self.decode_response(200, data)
 
-        async with self.session.post("https://graphql.anilist.co", json={
+    async def send_query(self, endpoint, query, variables={}):
+        data = await self.request(endpoint, 'POST', self.domain, body={
             "query": query,
             "variables": variables
-        }) as resp:
-            json = await resp.json()
+        })
 
-        if 'errors' in json:
+        if 'errors' in data:
             raise ErrorCollection(
-                json['errors']
+                data['errors']
             )
         else:
-            return json['data']
+            return data['data']
 
     async def search_characters(self, search, page=1, limit=20):
-        data = await self.send_request("""
+        data = await self.send_query('search_characters', """
 query ($search:String, $page:Int, $perpage:Int) {
     Page (page: $page, perPage: $perpage) {
         characters (search: $search, sort: SEARCH_MATCH) {
@@ -0,0 +1,110 @@
+import aiohttp
+import asyncio
+import json
+import logging
+import urllib.parse
+
+# Respostas que indicam uma falha temporária, a requisição é repetida (se houver um limitador).
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Quantos caracteres do corpo de uma resposta inválida são mostrados no erro.
+MAX_ERROR_BODY_LENGTH = 120
+
+class ApiError(Exception):
+    pass
+
+def get_body_preview(data: bytes):
+    text = ' '.join(data[:MAX_ERROR_BODY_LENGTH * 4].decode('utf-8', errors='replace').split()).replace('`', "'")
+    return text[:MAX_ERROR_BODY_LENGTH] + ('...' if len(text) > MAX_ERROR_BODY_LENGTH else '')
+
+# @NOTE:
+# Base dos clientes de API, todas as requisições passam por request(), que utiliza o cache de respostas
+# (navibot.apicache.ApiResponseCache) caso ele tenha sido informado e o endpoint tenha um TTL em CACHE_TTLS.
+# Com um limitador (navibot.ratelimit.HostRateLimiter), cada requisição espera a vez do seu host e falhas temporárias são repetidas.
+class ApiClient:
+    # Endpoint: (segundos em que a resposta é atual, segundos em que ainda pode ser entregue enquanto é atualizada).
+    CACHE_TTLS = {}
+
+    def __init__(self, name: str, domain: str, aiohttpSession: aiohttp.ClientSession, cache=None, limiter=None):
+        self.name = name
+        self.domain = domain
+        self.session = aiohttpSession
+        self.cache = cache
+        self.limiter = limiter
+
+    # A mesma requisição sempre gera a mesma chave, independente da ordem dos parâmetros.
+    @staticmethod
+    def get_request_key(method: str, url: str, params: dict=None, body: dict=None):
+        return (
+            method,
+            url,
+            tuple(sorted((str(k), str(v)) for k, v in params.items())) if params else (),
+            json.dumps(body, sort_keys=True, separators=(',', ':')) if body is not None else None
+        )
+
+    async def send_request(self, method: str, url: str, params: dict=None, body: dict=None):
+        host = urllib.parse.urlsplit(url).hostname
+        attempt = 0
+
+        while True:
+            if self.limiter:
+                try:
+                    await self.limiter.acquire(host)
+                except asyncio.TimeoutError:
+                    raise ApiError(f'O serviço `{host}` está limitando as requisições no momento, tente novamente mais tarde.')
+
+            retry_after = None
+
+            try:
+                async with self.session.request(method, url, params=params, json=body) as resp:
+                    data = await resp.read()
+
+                    if self.limiter:
+                        retry_after = self.limiter.update(host, resp.status, resp.headers)
+
+                    if resp.status not in RETRY_STATUSES:
+                        # Respostas de erro só seguem adiante se forem JSON (Ex: a lista de erros do GraphQL),
+                        # páginas HTML ou texto (Ex: um proxy ou página de manutenção) viram um ApiError aqui.
+                        if resp.status != 200:
+                            self.decode_response(resp.status, data)
+
+                        return data, resp.status == 200
+
+                    error = f'HTTP {resp.status}'
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f'{type(e).__name__}: {e}'
+
+            if not self.limiter or attempt >= self.limiter.max_retries:
+                if self.limiter:
+                    self.limiter.get_limit(host).failures += 1
+
+                raise ApiError(f'Não foi possível obter uma resposta de `{host}` ({error}), tente novamente mais tarde.')
+
+            delay = self.limiter.get_backoff(host, attempt, retry_after)
+            logging.warning(f'ApiClient {self.name}, request to {host} failed ({error}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.limiter.max_retries})')
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def request(self, endpoint: str, method: str, url: str, params: dict=None, body: dict=None):
+        ttl, stale_ttl = self.CACHE_TTLS.get(endpoint, (0, 0))
+
+        if self.cache and ttl > 0:
+            data = await self.cache.get(
+                self.name,
+                self.get_request_key(method, url, params, body),
+                ttl,
+                lambda: self.send_request(method, url, params, body),
+                stale_ttl=stale_ttl
+            )
+        else:
+            data, _ = await self.send_request(method, url, params, body)
+
+        # Cada chamada recebe o seu próprio objeto, o cache guarda somente os bytes.
+        return self.decode_response(200, data)
+
+    def decode_response(self, status: int, data: bytes):
+        try:
+            return json.loads(data)
+        except ValueError:
+            raise ApiError(f'O serviço `{self.name}` retornou uma resposta inválida (HTTP {status}): `{get_body_preview(data)}`')
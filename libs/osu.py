@@ -2,6 +2,8 @@ import aiohttp
 import logging
 from enum import Enum, auto
 
+from libs.apiclient import ApiClient
+
 class Gamemode(Enum):
     OSU = 0
     TAIKO = 1
@@ -17,26 +19,28 @@ class Gamemode(Enum):
         return getattr(Gamemode, name)
 
 # @TODO: Fazer com que APIs retornem seus próprios objetos
-class OsuApi:
-    def __init__(self, key, aiohttpSession: aiohttp.ClientSession):
-        self.session = aiohttpSession
-        self.domain = r'https://osu.ppy.sh'
+class OsuApi(ApiClient):
+    CACHE_TTLS = {
+        'get_user': (60, 240),
+        'user_best': (120, 480)
+    }
+
+    def __init__(self, key, aiohttpSession: aiohttp.ClientSession, cache=None, limiter=None):
+        super().__init__('osu', r'https://osu.ppy.sh', aiohttpSession, cache=cache, limiter=limiter)
         self.key = key
 
     async def fetch_user(self, username, mode=Gamemode.OSU):
-        async with self.session.get(f'{self.domain}/api/get_user', params={
+        return await self.request('get_user', 'GET', f'{self.domain}/api/get_user', params={
             'k': self.key,
             'u': username,
             'm': mode.value,
             'type': 'string'
-        }) as response:
-            return await response.json()
+        })
 
     async def public_fetch_user_best(self, userid, mode=Gamemode.OSU, limit=10):
         assert limit >= 0
 
-        async with self.session.get(f'{self.domain}/users/{userid}/scores/best', params={
+        return await self.request('user_best', 'GET', f'{self.domain}/users/{userid}/scores/best', params={
             'mode': Gamemode.public_gamemode_string(mode),
             'limit': limit
-        }) as response:
-            return await response.json()
\ No newline at end of file
+        })
\ No newline at end of file
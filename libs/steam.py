@@ -1,11 +1,18 @@
 import aiohttp
 import logging
 
+from libs.apiclient import ApiClient
+
 # @TODO: Fazer com que APIs retornem seus próprios objetos
-class SteamApi:
-    def __init__(self, key, aiohttpSession: aiohttp.ClientSession):
-        self.domain = "http://api.steampowered.com"
-        self.session = aiohttpSession
+class SteamApi(ApiClient):
+    CACHE_TTLS = {
+        'player_summaries': (30, 90),
+        'steam_level': (600, 3600),
+        'resolve_vanity_url': (3600, 86400)
+    }
+
+    def __init__(self, key, aiohttpSession: aiohttp.ClientSession, cache=None, limiter=None):
+        super().__init__('steam', "http://api.steampowered.com", aiohttpSession, cache=cache, limiter=limiter)
         self.key = key
 
     @staticmethod
@@ -16,27 +23,24 @@ class SteamApi:
             return 'Unknown'
 
     async def get_player_summaries(self, steamids):
-        async with self.session.get(f"{self.domain}/ISteamUser/GetPlayerSummaries/v2/", params={
+        return await self.request('player_summaries', 'GET', f"{self.domain}/ISteamUser/GetPlayerSummaries/v2/", params={
             "key": self.key,
             "steamids": ','.join([str(i) for i in steamids]),
             "format": "json"
-        }) as resp:
-            return await resp.json()
+        })
     
     async def get_steam_level(self, steamid):
-        async with self.session.get(f"{self.domain}/IPlayerService/GetSteamLevel/v1/", params={
+        return await self.request('steam_level', 'GET', f"{self.domain}/IPlayerService/GetSteamLevel/v1/", params={
             "key": self.key,
             "steamid": steamid,
             "format": "json"
-        }) as resp:
-            return await resp.json()
+        })
     
     async def resolve_vanity_url(self, vanityurl):
-        async with self.session.get(f"{self.domain}/ISteamUser/ResolveVanityURL/v1/", params={
+        return await self.request('resolve_vanity_url', 'GET', f"{self.domain}/ISteamUser/ResolveVanityURL/v1/", params={
             "key": self.key,
             "vanityurl": vanityurl,
             "format": "json",
             "url_type": 1
-        }) as resp:
-            return await resp.json()
+        })
     
\ No newline at end of file
@@ -1,10 +1,16 @@
 import aiohttp
 
+from libs.apiclient import ApiClient
+
 # @TODO: Fazer com que APIs retornem seus próprios objetos
-class YandereApi:
-    def __init__(self, aiohttpSession: aiohttp.ClientSession):
-        self.session = aiohttpSession
-        self.domain = r'https://yande.re'
+class YandereApi(ApiClient):
+    CACHE_TTLS = {
+        'tags': (600, 1800),
+        'posts': (60, 180)
+    }
+
+    def __init__(self, aiohttpSession: aiohttp.ClientSession, cache=None, limiter=None):
+        super().__init__('yandere', r'https://yande.re', aiohttpSession, cache=cache, limiter=limiter)
 
     @staticmethod
     def tagtype_string(id):
@@ -33,16 +39,14 @@ class YandereApi:
         elif name:
             params['name'] = name
 
-        async with self.session.get(f'{self.domain}/tag.json', params=params) as response:
-            return await response.json()
+        return await self.request('tags', 'GET', f'{self.domain}/tag.json', params=params)
 
     async def fetch_posts(self, tags='', page=1, limit=20):
         assert limit >= 0
         assert type(tags) is str or type(tags) is list
 
-        async with self.session.get(f'{self.domain}/post.json', params={
+        return await self.request('posts', 'GET', f'{self.domain}/post.json', params={
             'tags': ' '.join(tags) if type(tags) is list else tags,
             'page': page,
             'limit': limit
-        }) as response:
-            return await response.json()
\ No newline at end of file
+        })
\ No newline at end of file
@@ -197,4 +197,101 @@ class CReload(BotCommand):
             
             return EmojiType.CHECK_MARK
         except Exception as e:
-            raise CommandError(f'Ocorreu um erro ao tentar efetuar o reload:\n\n`{type(e).__name__}: {e}`')
\ No newline at end of file
+            raise CommandError(f'Ocorreu um erro ao tentar efetuar o reload:\n\n`{type(e).__name__}: {e}`')
+
+class CQueryStats(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "querystats",
+            aliases = ['qstats'],
+            description = "Exibe as queries que mais consumiram tempo desde a inicialização do bot (ou desde o último `--reset`).",
+            usage = "[--top=10] [--reset]",
+            permissionlevel = PermissionLevel.BOT_OWNER,
+            hidden = True
+        )
+
+        # Mais do que isso nunca caberia em uma única mensagem.
+        self.max_top = 25
+
+    async def run(self, ctx, args, flags):
+        if 'reset' in flags:
+            self.bot.querystats.reset()
+            return EmojiType.CHECK_MARK
+
+        try:
+            top = int(flags.get('top', 10))
+            assert top > 0 and top <= self.max_top
+        except (ValueError, AssertionError):
+            raise CommandError(f'O argumento `--top` precisa ser um número inteiro entre 1 e {self.max_top}.')
+
+        return self.bot.querystats.format_statistics(top)
+
+class CDbBootstrap(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "dbbootstrap",
+            description = "Cria as tabelas e colunas que estiverem faltando no banco de dados e migra as imagens de fundo antigas para o BlobStore, necessário no MySQL após atualizações do schema (o SQLite faz isso sozinho ao conectar).",
+            permissionlevel = PermissionLevel.BOT_OWNER,
+            hidden = True
+        )
+
+    async def run(self, ctx, args, flags):
+        backend = await self.bot.get_connection_pool()
+
+        try:
+            await backend.bootstrap_schema()
+        except Exception as e:
+            logging.error(f'dbbootstrap failed: {type(e).__name__}: {e}')
+            raise CommandError(f'Não foi possível atualizar o schema do banco de dados: `{type(e).__name__}: {e}`')
+
+        await self.bot.migrate_legacy_profile_covers(backend)
+        return EmojiType.CHECK_MARK
+
+class CRenderStats(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "renderstats",
+            aliases = ['rstats'],
+            description = "Exibe a fila e o tempo de renderização por comando do RenderEngine desde a inicialização do bot (ou desde o último `--reset`).",
+            usage = "[--reset]",
+            permissionlevel = PermissionLevel.BOT_OWNER,
+            hidden = True
+        )
+
+    async def run(self, ctx, args, flags):
+        if 'reset' in flags:
+            self.bot.renderer.reset()
+            self.bot.imageresults.reset()
+            return EmojiType.CHECK_MARK
+
+        return self.bot.imageresults.format_statistics() + '\n' + self.bot.renderer.format_statistics()
+
+class CHttpStats(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "httpstats",
+            aliases = ['hstats'],
+            description = "Exibe as estatísticas de conexões e do cache de downloads do HttpManager e do cache de respostas e do limitador de requisições das APIs desde a inicialização do bot (ou desde o último `--reset`).",
+            usage = "[--reset]",
+            permissionlevel = PermissionLevel.BOT_OWNER,
+            hidden = True
+        )
+
+    async def run(self, ctx, args, flags):
+        if 'reset' in flags:
+            self.bot.http.statistics.reset()
+
+            if self.bot.http.cache:
+                self.bot.http.cache.reset()
+
+            self.bot.apicache.reset()
+            self.bot.ratelimiter.reset()
+            return EmojiType.CHECK_MARK
+
+        text = self.bot.http.statistics.format_statistics()
+        text += self.bot.http.cache.format_statistics() if self.bot.http.cache else 'O cache de downloads está desativado.\n'
+        return text + self.bot.apicache.format_statistics() + self.bot.ratelimiter.format_statistics()
\ No newline at end of file
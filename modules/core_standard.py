@@ -11,8 +11,12 @@ import aiohttp
 
 from navibot.helpers import IntervalContext, TimeoutContext
 from navibot.errors import CommandError, BotError
-from navibot.client import BotCommand, BotCommand, CommandAlias, InterpretedCommand, PermissionLevel, EmojiType, Slider, Plugin
+from navibot.client import BotCommand, BotCommand, CommandAlias, InterpretedCommand, PermissionLevel, EmojiType, Slider, Plugin, PlainText
 from navibot.util import is_instance, seconds_string, parse_timespan_seconds, timespan_seconds, seconds_string, bytes_string, normalize_image_max_size
+from navibot.imaging import render_triggered, render_thinking, ImageValue
+from navibot.filters import FILTERS, parse_filter_chain, compile_filter_chain, render_filter_chain
+from navibot.glyphs import TEXT_FONTS, render_text_image
+from navibot.asciiart import render_ascii
 
 class PPlayingStatusInterval(Plugin):
     def __init__(self, bot):
@@ -396,13 +400,11 @@ class CTriggered(BotCommand):
             bot,
             name = "triggered",
             aliases = ['trigg'],
-            description = "T R I G G E R E D.",
-            usage = '[URL] [@Usuario] [discord.File]',
-            supported_args_type = (str, discord.File)
+            description = "T R I G G E R E D, com `--animated` a imagem treme (GIF).",
+            usage = '[URL] [@Usuario] [discord.File] [-a|--animated]',
+            supported_args_type = (str, discord.File, ImageValue)
         )
 
-        self.triggered_image = PIL.Image.open(f'{self.bot.curr_path}/repo/std/triggered.png')
-        self.triggered_image.load()
         self.red_factor = 2.5
         self.suppress_factor = .9
 
@@ -410,57 +412,41 @@ class CTriggered(BotCommand):
         prefered_image_output_format = self.get_prefered_output_image_format()
         prefered_image_size = self.get_prefered_image_size()
 
-        curr_img = await self.get_image_target(ctx, args, flags, from_mention=True, from_arg=True, from_pipeline=True, from_history=True)
-        output = io.BytesIO()
-
-        def callable_apply_triggered_effect():
-            nonlocal curr_img
-            curr_img = normalize_image_max_size(curr_img.convert(mode='RGBA'), prefered_image_size)
-            # @NOTE:
-            # 1. Redimensionar trigered_image_copy para que tenha a mesma largura que curr_img
-            # 2. Aplicar filtro "vermelho" sobre curr_img
-            # 3. Aplicar trigered_image_copy sobre curr_img, alinhando ao canto inferior
-
-            # @PERFORMANCE:
-            # Por isso estamos executando dentro do run_in_executor
-            pixel = curr_img.load()
-            for x in range(curr_img.width):
-                for y in range(curr_img.height):
-                    # RGB
-                    p = pixel[(x, y)]
-
-                    v1 = math.floor(p[0] * self.red_factor)
-                    v2 = math.ceil(p[1] * self.suppress_factor)
-                    v3 = math.ceil(p[2] * self.suppress_factor)
-                    
-                    v1 = 255 if v1 > 255 else v1
-
-                    pixel[(x, y)] = (v1, v2, v3, p[3])
-
-            factor = curr_img.width / self.triggered_image.width
-
-            trigered_image_copy = self.triggered_image.resize((
-                math.floor(self.triggered_image.width * factor),
-                math.floor(self.triggered_image.height * factor)
-            ))
-
-            curr_img.paste(
-                trigered_image_copy, 
-                (0, curr_img.height - trigered_image_copy.height)
+        animated = 'animated' in flags or 'a' in flags
+
+        if animated:
+            prefered_image_output_format = 'gif'
+
+        source = await self.get_image_source(ctx, args, flags, from_mention=True, from_arg=True, from_pipeline=True, from_history=True)
+        key, cached = self.get_cached_image_result(source, (animated, self.red_factor, self.suppress_factor, prefered_image_size, prefered_image_output_format))
+
+        if cached:
+            return cached
+
+        curr_img = await self.get_image_from_source(source)
+
+        if animated:
+            # O modo animado gera a sua própria animação a partir do primeiro frame e já volta codificado (GIF).
+            output = await self.bot.renderer.render(
+                self.name,
+                render_triggered,
+                await self.bot.renderer.create_payload(curr_img),
+                prefered_image_size,
+                self.red_factor,
+                self.suppress_factor,
+                animated
             )
-            
-            curr_img.save(output, format=prefered_image_output_format.upper())
 
-        await asyncio.get_running_loop().run_in_executor(
-            None,
-            callable_apply_triggered_effect
-        )
+            return self.bot.imageresults.track(key, ImageValue(self.name, prefered_image_output_format, data=output))
 
-        output.seek(0, io.SEEK_SET)
-        return discord.File(
-            output,
-            filename=f'triggered.{prefered_image_output_format}'
-        )
+        return self.bot.imageresults.track(key, await self.render_image_value(
+            curr_img,
+            prefered_image_output_format,
+            render_triggered,
+            prefered_image_size,
+            self.red_factor,
+            self.suppress_factor
+        ))
 
 class CThinking(BotCommand):
     def __init__(self, bot):
@@ -470,39 +456,139 @@ class CThinking(BotCommand):
             aliases = ['think'],
             description = "Hmmmmmmmmmmm :thinking:.",
             usage = '[URL] [@Usuario] [discord.File]',
-            supported_args_type = (str, discord.File)
+            supported_args_type = (str, discord.File, ImageValue)
         )
 
-        self.thinking_image = PIL.Image.open(f'{self.bot.curr_path}/repo/std/thinkinghand.png')
-        self.thinking_image.load()
+    async def run(self, ctx, args, flags):
+        prefered_image_output_format = self.get_prefered_output_image_format()
+        max_image_size = self.get_prefered_image_size()
+
+        source = await self.get_image_source(ctx, args, flags, from_mention=True, from_arg=True, from_pipeline=True, from_history=True)
+        key, cached = self.get_cached_image_result(source, (max_image_size, prefered_image_output_format))
+
+        if cached:
+            return cached
+
+        curr_img = await self.get_image_from_source(source)
+
+        return self.bot.imageresults.track(key, await self.render_image_value(
+            curr_img,
+            prefered_image_output_format,
+            render_thinking,
+            max_image_size
+        ))
+
+class CFilter(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "filter",
+            aliases = ['fx'],
+            description = "Aplica uma sequência de filtros sobre a imagem, Ex: `filter sepia,pixelate=8,blur=2`, utilize `--list` para ver os filtros disponíveis.",
+            usage = 'filtro[=valor],... [URL] [@Usuario] [discord.File] [--list]',
+            supported_args_type = (str, discord.File, ImageValue)
+        )
 
     async def run(self, ctx, args, flags):
+        if 'list' in flags:
+            return '\n'.join(f.get_usage_text() for f in FILTERS.values())
+
+        if not args or not isinstance(args[0], str):
+            return self.get_usage_embed(ctx)
+
+        # Validamos a especificação antes de buscar a imagem, um erro de digitação não deve custar um download.
+        chain = parse_filter_chain(args[0])
         prefered_image_output_format = self.get_prefered_output_image_format()
         max_image_size = self.get_prefered_image_size()
 
-        curr_img = await self.get_image_target(ctx, args, flags, from_mention=True, from_arg=True, from_pipeline=True, from_history=True)
-        output = io.BytesIO()
+        source = await self.get_image_source(ctx, args[1:], flags, from_mention=True, from_arg=True, from_pipeline=True, from_history=True)
+        key, cached = self.get_cached_image_result(source, (tuple(chain), max_image_size, prefered_image_output_format))
 
-        def callable_apply_thinking_effect():
-            nonlocal curr_img
-            curr_img = normalize_image_max_size(curr_img.convert(mode='RGBA'), max_image_size)
-            thinking_image_copy = normalize_image_max_size(self.thinking_image, math.floor(curr_img.height / 2))
+        if cached:
+            return cached
 
-            curr_img.paste(
-                thinking_image_copy, 
-                (math.floor(curr_img.width / 2 - thinking_image_copy.height / 2), curr_img.height - thinking_image_copy.height),
-                thinking_image_copy
-            )
+        curr_img = await self.get_image_from_source(source)
 
-            curr_img.save(output, format=prefered_image_output_format.upper())
+        return self.bot.imageresults.track(key, await self.render_image_value(
+            curr_img,
+            prefered_image_output_format,
+            render_filter_chain,
+            max_image_size,
+            compile_filter_chain(chain)
+        ))
 
-        await asyncio.get_running_loop().run_in_executor(
-            None,
-            callable_apply_thinking_effect
+class CTextImage(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "textimage",
+            aliases = ['ti'],
+            description = f"Transforma o texto informado em uma imagem, fontes disponíveis: {', '.join(f'`{x}`' for x in TEXT_FONTS)}.",
+            usage = '[texto...] [--font=raleway-bold] [--size=32]'
         )
 
-        output.seek(0, io.SEEK_SET)
-        return discord.File(
-            output,
-            filename=f'thinking.{prefered_image_output_format}'
-        )
\ No newline at end of file
+        self.max_text_length = 500
+        self.max_width = 512
+        self.max_lines = 20
+
+    async def run(self, ctx, args, flags):
+        if not args:
+            return self.get_usage_embed(ctx)
+
+        text = ' '.join(args)
+        font_name = flags.get('font', 'raleway-bold')
+
+        if len(text) > self.max_text_length:
+            raise CommandError(f'O texto informado ultrapassa o limite de {self.max_text_length} caracteres.')
+
+        if not font_name in TEXT_FONTS:
+            raise CommandError(f'A fonte `{font_name}` não existe, fontes disponíveis: {", ".join(f"`{x}`" for x in TEXT_FONTS)}.')
+
+        try:
+            size = int(flags.get('size', '32'))
+        except ValueError:
+            raise CommandError('A flag `--size` não possui um formato de número válido.')
+
+        if size < 8 or size > 128:
+            raise CommandError('O tamanho da fonte precisa estar entre 8 e 128.')
+
+        output = await self.bot.renderer.render(
+            self.name,
+            render_text_image,
+            text,
+            font_name,
+            size,
+            self.max_width,
+            self.max_lines
+        )
+
+        return ImageValue(self.name, self.get_prefered_output_image_format(), payload=output)
+
+class CAsciify(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "asciify",
+            aliases = ['ascii'],
+            description = "Desenha a imagem com caracteres, com `--color` utiliza as cores de um bloco de código ANSI e com `--invert` inverte o brilho (tema claro).",
+            usage = '[URL] [@Usuario] [discord.File] [-c|--color] [-i|--invert]',
+            supported_args_type = (str, discord.File, ImageValue)
+        )
+
+        # Limite de caracteres de uma mensagem do discord.
+        self.max_output_length = 2000
+        self.max_columns = 64
+
+    async def run(self, ctx, args, flags):
+        curr_img = await self.get_image_target(ctx, args, flags, from_mention=True, from_arg=True, from_pipeline=True, from_history=True)
+
+        # Enviado como conteúdo da mensagem, dentro de um embed o bloco de código ANSI perderia as cores.
+        return PlainText(await self.bot.renderer.render(
+            self.name,
+            render_ascii,
+            await self.bot.renderer.create_payload(curr_img),
+            self.max_output_length,
+            self.max_columns,
+            'color' in flags or 'c' in flags,
+            'invert' in flags or 'i' in flags
+        ))
\ No newline at end of file
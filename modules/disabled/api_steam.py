@@ -15,7 +15,7 @@ class CSteam(BotCommand):
             usage = "steamID|customURL"
         )
 
-        self.api = SteamApi(self.bot.config.get('modules.steam.key'),self.bot.get_http_session())
+        self.api = SteamApi(self.bot.config.get('modules.steam.key'),self.bot.get_http_session(), cache=self.bot.apicache, limiter=self.bot.ratelimiter)
 
     async def run(self, ctx, args, flags):
         if not args:
@@ -3,20 +3,26 @@ import asyncio
 import logging
 import aiohttp
 import io
+import os
 import math
 import time
 import copy
+import array
+import zlib
 import PIL.Image
 import PIL.ImageFont
 import PIL.ImageDraw
 import PIL.ImageFilter
 
-from navibot.helpers import IntervalContext
-from navibot.errors import CommandError
-from navibot.client import Bot, BotCommand, PermissionLevel, EmojiType, ClientEvent, BotContext, Plugin
-from navibot.util import bytes_string, normalize_image_max_size, normalize_image_fit_into
-from navibot.database.dal import MemberInfoDAL
+from navibot.helpers import IntervalContext, TokenBucket, LRUCache, DiskCache
+from navibot.errors import CommandError, BotError
+from navibot.client import Bot, BotCommand, PermissionLevel, EmojiType, ClientEvent, BotContext, Plugin, Slider
+from navibot.util import bytes_string, normalize_image_max_size, normalize_image_fit_into, sniff_image_format
+from navibot.database.dal import MemberInfoDAL, MemberActivityDAL
+from navibot.database.instrumentation import query_origin
 from navibot.database.models import MemberInfo
+from navibot.ranking import Leaderboard, WindowedLeaderboard
+from navibot.imaging import render_profile, render_profile_cover, ImageValue
 
 class PProgressionRewarder(Plugin):
     def __init__(self, bot):
@@ -60,22 +66,59 @@ class PProgressionRewarder(Plugin):
         if not isinstance(message.channel, discord.TextChannel) or message.author == self.bot.client.user or message.author.bot:
             return
 
+        # Cada evento roda em sua própria task, não precisamos restaurar o valor anterior.
+        query_origin.set('progression_reward')
+
         expected_message_length = self.bot.config.get('progression.expected_message_length', 50)
         expected_reward_value = self.bot.config.get('progression.expected_reward_value', 50)
 
-        show_levelup = await self.bot.guildsettings.get_guild_variable(message.guild.id, 'pro_show_levelup')
-
         receive_factor = len(message.content) / expected_message_length
         if receive_factor > 1:
             receive_factor = 1
 
         received_exp = math.ceil(expected_reward_value * receive_factor)
 
+        # Mensagens sem texto, repetidas ou enviadas rápido demais não geram recompensa (nem escrita no banco).
+        if received_exp <= 0 or not self.manager.is_reward_allowed(message.author.id, message.content):
+            return
+
+        show_levelup = await self.bot.guildsettings.get_guild_variable(message.guild.id, 'pro_show_levelup')
+
         member_info, levelup = await self.manager.give_exp_reward(message.author.id, received_exp)
+        self.manager.record_activity(message.author.id, received_exp)
 
         if levelup and show_levelup.get_value():
             await self.handle_levelup_message(message, member_info.get_current_level())
 
+# @NOTE:
+# Estado anti-farming de cada membro, o próprio token bucket (recompensas por intervalo de tempo)
+# mais um ring buffer com o fingerprint (CRC32) das últimas mensagens, guardado em um array de inteiros.
+class MemberRewardState(TokenBucket):
+    __slots__ = ('fingerprints', 'position', 'last_seen')
+
+    def __init__(self, rate: float, capacity: float, history: int):
+        super().__init__(rate, capacity)
+        self.fingerprints = array.array('L', [0] * history)
+        self.position = 0
+        self.last_seen = self.updated_at
+
+    @staticmethod
+    def create_fingerprint(content: str):
+        # Ignora diferenças de caixa e espaçamento, "Oi  Tudo bem" é a mesma mensagem que "oi tudo bem".
+        return zlib.crc32(' '.join(content.lower().split()).encode('utf-8'))
+
+    # Registra o fingerprint, retornando True caso ele já esteja entre as últimas mensagens.
+    def push_fingerprint(self, fingerprint: int):
+        if not self.fingerprints:
+            return False
+
+        if fingerprint in self.fingerprints:
+            return True
+
+        self.fingerprints[self.position] = fingerprint
+        self.position = (self.position + 1) % len(self.fingerprints)
+        return False
+
 class ProgressionManager:
     def __init__(self, bot: Bot, max_level_allowed=100):
         self.bot = bot
@@ -83,6 +126,37 @@ class ProgressionManager:
         self.pending_processing = set()
         self.max_level_allowed = max_level_allowed
 
+        # @NOTE:
+        # Anti-farming, cada membro pode receber até reward_burst recompensas seguidas, depois disso
+        # somente uma a cada reward_refill_interval segundos, mensagens repetidas nunca são recompensadas.
+        self.reward_states = {}
+        self.reward_refill_interval = bot.config.get('modules.progression.reward_refill_interval', 20)
+        self.reward_burst = bot.config.get('modules.progression.reward_burst', 3)
+        self.reward_duplicate_history = bot.config.get('modules.progression.reward_duplicate_history', 8)
+        self.rewards_dropped_duplicate = 0
+        self.rewards_dropped_ratelimit = 0
+
+        # Membros sem nenhuma atividade por esse tempo (em segundos) são removidos do cache após a sincronização.
+        self.member_idle_ttl = bot.config.get('modules.progression.member_idle_ttl', 1800)
+
+        # @NOTE:
+        # Ranking global de EXP em memória, carregado uma única vez a partir do banco (sob demanda)
+        # e atualizado a cada recompensa recebida.
+        self.leaderboard = Leaderboard()
+        self.leaderboard_loaded = False
+        self.leaderboard_lock = asyncio.Lock()
+
+        # @NOTE:
+        # Rankings por janela de tempo (últimas 24 horas em buckets de 1 hora e últimos 7 dias em buckets de 1 dia),
+        # pending_activity acumula o EXP recebido por (membro, hora) até a próxima sincronização com o banco.
+        self.activity_windows = {
+            'daily': WindowedLeaderboard(3600, 24),
+            'weekly': WindowedLeaderboard(86400, 7)
+        }
+        self.pending_activity = {}
+        self.activity_loaded = False
+        self.activity_lock = asyncio.Lock()
+
         self.sync_interval = IntervalContext(
             bot.config.get('modules.progression.sync_interval', 300),
             self.callable_proccess_pending,
@@ -102,6 +176,8 @@ class ProgressionManager:
         return self.sync_interval.is_running()
 
     async def callable_proccess_pending(self, interval: IntervalContext, kwargs: dict):
+        query_origin.set('progression_sync')
+
         stamp = time.perf_counter()
         logging.info(f'Starting processing of pending_processing MemberInfo queue at timestamp {stamp}...')
 
@@ -109,26 +185,182 @@ class ProgressionManager:
         pending_copy = self.pending_processing.copy()
         self.pending_processing.clear()
 
+        pending_create = []
+        pending_update = []
+        failed = []
+
+        try:
+            async with (await self.bot.get_connection_pool()).acquire() as conn:
+                d = MemberInfoDAL(conn)
+
+                # Só precisamos saber quem já existe e com qual EXP, nada de carregar o resto da linha.
+                existing = await d.get_member_exp_batch([mem.userid for mem in pending_copy])
+
+                for mem in pending_copy:
+                    if not mem.userid in existing:
+                        pending_create.append(mem)
+                    elif existing[mem.userid] != mem.exp:
+                        pending_update.append(mem)
+
+                # @NOTE:
+                # As escritas são enviadas em lote, o backend decide como agrupar isso (Ex: uma transação por lote no SQLite).
+                if pending_create and not await d.create_member_info_batch(pending_create):
+                    logging.info(f'callable_proccess_pending Failed to create_member_info_batch for {len(pending_create)} member(s) in queue.')
+                    failed.extend(pending_create)
+
+                if pending_update and not await d.update_member_info_exp_only_batch(pending_update):
+                    logging.info(f'callable_proccess_pending Failed to update_member_info_exp_only_batch for {len(pending_update)} member(s) in queue.')
+                    failed.extend(pending_update)
+        except Exception as e:
+            logging.error(f'callable_proccess_pending Failed to write the pending_processing MemberInfo queue: {type(e).__name__}: {e}')
+            # Não sabemos o que chegou a ser escrito, então tudo volta para a fila,
+            # na próxima vez quem já foi escrito é reconhecido pelo get_member_exp_batch e ignorado.
+            failed = pending_copy
+
+        # @NOTE:
+        # Quem falhou volta para pending_processing, assim o evict_idle_members também não remove esses membros do cache.
+        if failed:
+            self.pending_processing.update(failed)
+            logging.warning(f'callable_proccess_pending {len(failed)} member(s) will be retried on the next sync.')
+
+        logging.info(f'Finished processing of pending_processing MemberInfo queue ({len(pending_create)} created, {len(pending_update)} updated, {len(failed)} failed), took {time.perf_counter() - stamp} second(s).')
+
+        await self.flush_activity()
+        self.evict_idle_members()
+
+    def is_reward_allowed(self, memid: int, content: str):
+        state = self.reward_states.get(memid, None)
+
+        if not state:
+            state = MemberRewardState(1 / self.reward_refill_interval, self.reward_burst, self.reward_duplicate_history)
+            self.reward_states[memid] = state
+
+        state.last_seen = time.monotonic()
+
+        # O fingerprint é registrado mesmo se o membro estiver limitado, assim copiar e colar a mesma mensagem depois também não vale.
+        if state.push_fingerprint(state.create_fingerprint(content)):
+            self.rewards_dropped_duplicate += 1
+            return False
+
+        if not state.consume(now=state.last_seen):
+            self.rewards_dropped_ratelimit += 1
+            return False
+
+        return True
+
+    # @NOTE:
+    # Só pode ser chamado logo após a sincronização, membros que ainda estão pendentes (receberam EXP durante ela)
+    # continuam em cache, caso contrário perderíamos EXP que ainda não foi escrito no banco.
+    def evict_idle_members(self):
+        deadline = time.monotonic() - self.member_idle_ttl
+
+        for memid in [memid for memid, state in self.reward_states.items() if state.last_seen < deadline]:
+            del self.reward_states[memid]
+
+        evicted = [
+            memid for memid, member_info in self.membermap.items()
+            if not memid in self.reward_states and not member_info in self.pending_processing
+        ]
+
+        for memid in evicted:
+            del self.membermap[memid]
+
+        logging.info(f'evict_idle_members Evicted {len(evicted)} idle member(s), {len(self.membermap)} still cached, rewards dropped so far: {self.rewards_dropped_duplicate} duplicate(s), {self.rewards_dropped_ratelimit} rate limited.')
+
+    # Primeira hora que ainda faz parte da maior janela (7 dias), tudo antes disso pode ser descartado.
+    @staticmethod
+    def get_activity_retention_hour():
+        return (int(time.time() // 86400) - 6) * 24
+
+    def record_activity(self, memid: int, amount: int):
+        timestamp = time.time()
+
+        for window in self.activity_windows.values():
+            window.add(memid, amount, timestamp)
+
+        key = (memid, int(timestamp // 3600))
+        self.pending_activity[key] = self.pending_activity.get(key, 0) + amount
+
+    async def flush_activity(self):
+        # O lock garante que load_activity nunca veja uma hora que já foi escrita no banco e também continua pendente.
+        async with self.activity_lock:
+            if not self.pending_activity:
+                return
+
+            stamp = time.perf_counter()
+            # Trocamos o dicionário antes de escrever, o que for recebido durante a escrita fica para a próxima vez.
+            pending = self.pending_activity
+            self.pending_activity = {}
+
+            try:
+                async with (await self.bot.get_connection_pool()).acquire() as conn:
+                    d = MemberActivityDAL(conn)
+
+                    if not await d.add_member_activity_batch([(memid, hour, exp) for (memid, hour), exp in pending.items()]):
+                        logging.info(f'flush_activity Failed to add_member_activity_batch for {len(pending)} bucket(s).')
+            except Exception as e:
+                # Devolve o que não foi escrito, somando com o que chegou enquanto isso.
+                for key, exp in pending.items():
+                    self.pending_activity[key] = self.pending_activity.get(key, 0) + exp
+
+                logging.error(f'flush_activity Failed to write {len(pending)} activity bucket(s), they will be retried on the next flush: {type(e).__name__}: {e}')
+                raise e
+
+            async with (await self.bot.get_connection_pool()).acquire() as conn:
+                await MemberActivityDAL(conn).remove_activity_before(self.get_activity_retention_hour())
+
+            logging.info(f'flush_activity Finished writing {len(pending)} activity bucket(s), took {time.perf_counter() - stamp} second(s).')
+
+    async def load_activity(self):
+        stamp = time.perf_counter()
+
+        async with (await self.bot.get_connection_pool()).acquire() as conn:
+            d = MemberActivityDAL(conn)
+            rows = await d.get_activity_since(self.get_activity_retention_hour())
+
+        # @NOTE:
+        # Tudo que foi recebido antes do carregamento ou já está no banco ou continua pendente,
+        # portanto recriamos as janelas a partir dessas duas fontes (sem nenhum await no meio).
+        for window in self.activity_windows.values():
+            window.clear()
+
+            for memid, hour, exp in rows:
+                window.add(memid, exp, hour * 3600)
+
+            for (memid, hour), exp in self.pending_activity.items():
+                window.add(memid, exp, hour * 3600)
+
+        self.activity_loaded = True
+        logging.info(f'load_activity Finished loading {len(rows)} activity bucket(s), took {time.perf_counter() - stamp} second(s).')
+
+    async def get_activity_window(self, name: str):
+        async with self.activity_lock:
+            if not self.activity_loaded:
+                await self.load_activity()
+
+        return self.activity_windows[name]
+
+    async def load_leaderboard(self):
+        stamp = time.perf_counter()
+
         async with (await self.bot.get_connection_pool()).acquire() as conn:
             d = MemberInfoDAL(conn)
 
-            for mem in pending_copy:
-                # @TODO:
-                # Isso é bizarro, mas por enquanto vamos pegar novamente o membro,
-                # trocar para isso:
-                # d.member_info_exists(mem.userid)
-                # Após ser implementado
-                member_exists = await d.get_member_info(mem.userid)
-
-                if not member_exists:
-                    if not await d.create_member_info(mem):
-                        logging.info(f'callable_proccess_pending Failed to create_member_info for member {mem.userid} in queue.')
-                else:
-                    if member_exists.exp != mem.exp:
-                        if not await d.update_member_info_exp_only(mem):
-                            logging.info(f'callable_proccess_pending Failed to update_member_info_exp_only for member {mem.userid} in queue.')
-        
-        logging.info(f'Finished processing of pending_processing MemberInfo queue, took {time.perf_counter() - stamp} second(s).')
+            async for rows in d.iterate_member_exp():
+                for memid, exp in rows:
+                    # A versão em cache pode ter EXP ainda não sincronizado com o banco.
+                    cached = self.membermap.get(memid, None)
+                    self.leaderboard.update(memid, cached.exp if cached else exp)
+
+        self.leaderboard_loaded = True
+        logging.info(f'load_leaderboard Finished loading {len(self.leaderboard)} member(s), took {time.perf_counter() - stamp} second(s).')
+
+    async def get_leaderboard(self):
+        async with self.leaderboard_lock:
+            if not self.leaderboard_loaded:
+                await self.load_leaderboard()
+
+        return self.leaderboard
 
     @staticmethod
     def apply_uncacheable_attributes(cached_ver: MemberInfo, database_ver: MemberInfo):
@@ -140,7 +372,7 @@ class ProgressionManager:
         # em casos de atributos que não podem ficar em cache
         instance = copy.copy(cached_ver)
         # Aplica...
-        instance.profile_cover = database_ver.profile_cover
+        instance.profile_cover_hash = database_ver.profile_cover_hash
 
         return instance
 
@@ -155,25 +387,19 @@ class ProgressionManager:
             return await d.get_member_info_cacheable(memid)
 
     async def fetch_member_info_full(self, memid: int):
-        in_cache = await self.get_cacheable_member_info(memid)
-
         # @NOTE:
-        # Só lembrando, que get_cacheable_member_info, pode retornar uma instância em cache,
-        # o que está certo neste caso, mas também pode retornar uma nova instância direta do banco
-        # que acabou de ser carregada em cache, ou seja, in_cache e in_db vão estar identicos
+        # Uma única query com o EXP e a hash da imagem de fundo, se o membro estiver em cache
+        # o EXP de lá tem prioridade, pois ainda pode não ter sido sincronizado com o banco.
+        in_db = await self.fetch_member_info(memid)
+        in_cache = self.membermap.get(memid, None)
 
         if in_cache:
-            in_db = await self.fetch_member_info(memid)
-            
-            if in_db:
-                return self.apply_uncacheable_attributes(in_cache, in_db)
-            else:
-                # Nossa versão em cache é obsoleta?
-                # por hora, não faça nada
-                return in_cache
+            return self.apply_uncacheable_attributes(in_cache, in_db) if in_db else in_cache
+        elif in_db:
+            return in_db
         else:
-            # Não achou
-            return in_cache
+            # Ainda não possui um perfil, é exibido como um perfil vazio.
+            return MemberInfo(memid, 0, None)
 
     async def get_cacheable_member_info(self, memid: int):
         member_info = self.membermap.get(memid, None)
@@ -201,6 +427,7 @@ class ProgressionManager:
                 member_info.exp = max_allowed_exp
 
             curr_level = member_info.get_current_level()
+            self.leaderboard.update(memid, member_info.exp)
 
             if not member_info in self.pending_processing:
                 self.pending_processing.add(member_info)
@@ -209,6 +436,14 @@ class ProgressionManager:
         else:
             return member_info, False
 
+    # @NOTE:
+    # As imagens de fundo ficam no BlobStore, o banco só guarda a hash (arquivos iguais são armazenados uma única vez).
+    async def store_profile_cover(self, data: bytes):
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: self.bot.blobs.put(data)
+        )
+
     # @NOTE: Precisamos disso aqui para que, alem de MemberInfo ser alterado em cache
     # que seja feita a alteração instanamente no banco, caso o usuário mude sua profile_cover
     async def update_member_info_profile_cover_only(self, member_info: MemberInfo):
@@ -216,6 +451,19 @@ class ProgressionManager:
             d = MemberInfoDAL(conn)
             return await d.update_member_info_profile_cover_only(member_info)
 
+ACTIVITY_WINDOW_DESCRIPTIONS = {
+    'daily': 'nas últimas 24 horas',
+    'weekly': 'nos últimos 7 dias'
+}
+
+def get_activity_window_name(flags: dict):
+    if 'weekly' in flags:
+        return 'weekly'
+    elif 'daily' in flags:
+        return 'daily'
+
+    return None
+
 class CSetProfileCover(BotCommand):
     def __init__(self, bot):
         super().__init__(
@@ -224,7 +472,7 @@ class CSetProfileCover(BotCommand):
             aliases = ['setpfc'],
             description = "Atualiza a imagem de fundo do perfil do usuário de acordo com a imagem informada, caso nenhum argumento ou arquivo for informado através do operador |, este comando tentará pegar a ultima imagem enviada no canal que atenda os requisitos.",
             usage = '[URL] [discord.File] [-r|--remove]',
-            supported_args_type = (str, discord.File)
+            supported_args_type = (str, discord.File, ImageValue)
         )
 
         self.store_profile_cover_with_max_size = 512
@@ -240,26 +488,20 @@ class CSetProfileCover(BotCommand):
 
         bg = None
         if not is_removing:
-            bg = await self.get_image_target(ctx, args, flags, from_mention=False, from_arg=True, from_pipeline=True, from_history=True)
+            bg = await self.get_image_target(ctx, args, flags, from_mention=False, from_arg=True, from_pipeline=True, from_history=True, target_size=self.store_profile_cover_with_max_size)
 
         if bg:
-            bytedata = io.BytesIO()
-
-            def callable_resize_and_save_image():
-                nonlocal bg
-                bg = normalize_image_max_size(bg.convert(mode='RGB'), self.store_profile_cover_with_max_size)
-                bg.save(bytedata, format='JPEG')
-
-            await asyncio.get_running_loop().run_in_executor(
-                None,
-                callable_resize_and_save_image
+            bytedata = await self.bot.renderer.render(
+                self.name,
+                render_profile_cover,
+                await self.bot.renderer.create_payload(bg),
+                self.store_profile_cover_with_max_size
             )
 
-            bytedata.seek(0, io.SEEK_SET)
-            member_info.profile_cover = bytedata.getvalue()
+            member_info.profile_cover_hash = await pm.store_profile_cover(bytedata)
         else:
             if is_removing:
-                member_info.profile_cover = None
+                member_info.profile_cover_hash = None
             else:
                 return self.get_usage_embed(ctx)
 
@@ -278,21 +520,69 @@ class CProfile(BotCommand):
             usage = '[@Usuario]'
         )
 
-        self.profile_template_fl = PIL.Image.open(f'{self.bot.curr_path}/repo/profile/profile-template-fl.png')
-        self.profile_template_xpbar_full = PIL.Image.open(f'{self.bot.curr_path}/repo/profile/profile-template-xpbar-full.png')
-        self.profile_template_fl.load()
-        self.profile_template_xpbar_full.load()
+        # @NOTE:
+        # Os templates e as fontes são carregados (uma única vez) pelos processos do RenderEngine.
+        self.max_image_size = 116
+        self.prefered_avatar_size = 128
 
         # @NOTE:
-        # Isso é um arquivo que pode ser compartilhado entre outros comandos caso necessário
-        # se for preciso, fazer um sistema a parte de carregamento de fontes
-        self.font_raleway_bold = PIL.ImageFont.truetype(f'{self.bot.curr_path}/repo/font/Raleway-Bold.ttf', size=30)
-        self.font_sourcecodepro_bold = PIL.ImageFont.truetype(f'{self.bot.curr_path}/repo/font/SourceCodePro-Bold.otf', size=18)
+        # Perfis já renderizados, indexados por tudo que é visível no cartão (get_render_cache_key),
+        # opcionalmente com uma segunda camada em disco caso render_cache_path esteja configurado.
+        self.render_cache = LRUCache(
+            max_bytes=self.bot.config.get('modules.profile.render_cache_max_bytes', 8 * 1024 * 1024),
+            sizeof=len
+        )
 
-        # Deixa os bytes em memória, para que não seja preciso ficar pegando do disco toda vez.
+        render_cache_path = self.bot.config.get('modules.profile.render_cache_path', None)
+        self.render_cache_disk = DiskCache(
+            os.path.join(self.bot.curr_path, render_cache_path),
+            max_bytes=self.bot.config.get('modules.profile.render_cache_disk_max_bytes', 64 * 1024 * 1024)
+        ) if render_cache_path else None
 
-        self.max_image_size = 116
-        self.prefered_avatar_size = 128
+    @staticmethod
+    def get_avatar_key(user):
+        # user.avatar é a hash do avatar no CDN, ela muda sempre que o avatar muda.
+        return user.avatar if user.avatar else f'default-{user.default_avatar.value}'
+
+    def get_render_cache_key(self, target, member_info: MemberInfo, format: str):
+        # O texto de progresso exibe o EXP exato, portanto ele faz parte da chave (e já determina o nível e a barra).
+        return (target.id, member_info.exp, target.name, self.get_avatar_key(target), member_info.profile_cover_hash, format)
+
+    async def get_cached_render(self, key: tuple):
+        output = self.render_cache.get(key)
+
+        if not output and self.render_cache_disk:
+            output = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.render_cache_disk.get,
+                key
+            )
+
+            if output:
+                self.render_cache.put(key, output)
+
+        return output
+
+    async def put_cached_render(self, key: tuple, output: bytes):
+        self.render_cache.put(key, output)
+
+        if self.render_cache_disk:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    self.render_cache_disk.put,
+                    key,
+                    output
+                )
+            except OSError as e:
+                logging.error(f'put_cached_render failed to write to the disk cache: {type(e).__name__}: {e}')
+
+    def get_profile_cover_path(self, digest: str):
+        try:
+            return self.bot.blobs.get_blob_path(digest)
+        except BotError as e:
+            logging.error(f'get_profile_cover_path ignored an invalid profile cover: {e}')
+            return None
 
     async def run(self, ctx, args, flags):
         prefered_image_output_format = self.get_prefered_output_image_format()
@@ -306,132 +596,138 @@ class CProfile(BotCommand):
             target = mentions[0]
 
         pm = self.bot.plugins.get_plugin_by_type(PProgressionRewarder).manager
-        member_info = await pm.fetch_member_info_full(target.id)
-
 
-        if not member_info:
-            raise CommandError(f'Não foi possível encontrar as informações deste usuário, o usuário não possui um perfil ou ainda está em processamento, por favor tente novamente mais tarde.')
+        # @PERFORMANCE:
+        # O avatar não depende das informações do membro, então o download começa junto com a query,
+        # caso o perfil já esteja em cache o download é simplesmente cancelado.
+        avatar_task = asyncio.ensure_future(
+            self.get_file_from_url(str(target.avatar_url_as(size=self.prefered_avatar_size)), max_size=self.get_prefered_max_image_byte_size())
+        )
 
-        target_name = target.name
-        xp_curr_level = member_info.get_current_level()
-        xp_level_floor = member_info.get_exp_required_for_level(xp_curr_level)
-        xp_level_ceil = member_info.get_exp_required_for_level(xp_curr_level + 1)
-        xp_whole_level = xp_level_ceil - xp_level_floor
-        xp_factor = (member_info.exp - xp_level_floor) / xp_whole_level
-
-        profile_avatar = await self.get_image_object_from_bytes(await self.get_file_from_url(str(target.avatar_url_as(size=self.prefered_avatar_size)), max_size=self.get_prefered_max_image_byte_size()))
-        profile_background = None
-
-        if member_info.profile_cover:
-            profile_background = await self.get_image_object_from_bytes(io.BytesIO(member_info.profile_cover))
-
-        output = io.BytesIO()
-
-        def callable_apply_profile_template():
-            nonlocal profile_avatar
-            nonlocal profile_background
-
-            profile_avatar = normalize_image_max_size(profile_avatar.convert(mode='RGBA'), self.max_image_size)
-            profile_base = PIL.Image.new(mode='RGBA', size=(self.profile_template_fl.width, self.profile_template_fl.height), color=(255, 255, 255, 255))
-            profile_background = profile_background if profile_background else profile_avatar.filter(PIL.ImageFilter.BoxBlur(3))
-
-            if profile_background:
-                # Aplicando o plano de fundo caso ele exista
-                profile_base.paste(
-                    normalize_image_fit_into(profile_background.convert(mode='RGBA'), profile_base.width, profile_base.height),
-                    (
-                        0,
-                        0
-                    )
+        try:
+            member_info = await pm.fetch_member_info_full(target.id)
+            cache_key = self.get_render_cache_key(target, member_info, prefered_image_output_format)
+            output = await self.get_cached_render(cache_key)
+
+            if not output:
+                xp_curr_level = member_info.get_current_level()
+                xp_level_floor = member_info.get_exp_required_for_level(xp_curr_level)
+                xp_level_ceil = member_info.get_exp_required_for_level(xp_curr_level + 1)
+                xp_whole_level = xp_level_ceil - xp_level_floor
+                xp_factor = (member_info.exp - xp_level_floor) / xp_whole_level
+
+                # O avatar vem direto do CDN do discord, quem decodifica é o processo de renderização.
+                profile_avatar = await avatar_task
+
+                output, _ = await self.bot.renderer.render(
+                    self.name,
+                    render_profile,
+                    profile_avatar.getvalue(),
+                    self.get_profile_cover_path(member_info.profile_cover_hash) if member_info.profile_cover_hash else None,
+                    target.name,
+                    xp_curr_level,
+                    member_info.exp,
+                    xp_level_ceil,
+                    xp_factor,
+                    self.max_image_size,
+                    prefered_image_output_format,
+                    self.get_prefered_max_output_byte_size()
                 )
 
-            # Aplicando primeira camada do design do perfil
-            profile_base.paste(
-                self.profile_template_fl,
-                (
-                    0,
-                    0
-                ),
-                self.profile_template_fl
-            )
+                await self.put_cached_render(cache_key, output)
+        finally:
+            if not avatar_task.done():
+                avatar_task.cancel()
+            elif not avatar_task.cancelled():
+                # Evita o aviso de exceção nunca recuperada quando o avatar não foi necessário.
+                avatar_task.exception()
 
-            # Colando o avatar no perfil
-            profile_base.paste(
-                profile_avatar,
-                # 120 + 10 border
-                (
-                    math.floor(120 / 2 + 10 - profile_avatar.width / 2), 
-                    math.floor(120 / 2 + 10 - profile_avatar.height / 2)
-                )
-            )
+        # Com o formato "auto" a extensão depende do que o encoder escolheu, os próprios bytes dizem qual foi.
+        return discord.File(
+            io.BytesIO(output),
+            filename=f'profile.{sniff_image_format(output[:16])}'
+        )
 
-            # Colando a barra de EXP
-            profile_base.paste(
-                self.profile_template_xpbar_full.crop(
-                    (
-                        0,
-                        0,
-                        math.floor(self.profile_template_xpbar_full.width * xp_factor),
-                        self.profile_template_xpbar_full.height - 1
-                    )
-                ),
-                # Em x: 10, y: 185
-                (
-                    10,
-                    185
-                )
-            )
+class CLeaderboard(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "leaderboard",
+            aliases = ['lb', 'top'],
+            description = "Exibe um Slider com o ranking global de EXP dos membros, ou somente do EXP recebido nas últimas 24 horas (--daily) ou nos últimos 7 dias (--weekly).",
+            usage = '[--page=1] [--daily|--weekly]'
+        )
 
-            draw = PIL.ImageDraw.Draw(profile_base)
-            
-            # Escrevendo nome do usuário
-            draw.text(
-                (
-                    140,
-                    100 - self.font_raleway_bold.size - 10
-                ),
-                target_name,
-                fill=(255, 255, 255, 255),
-                font=self.font_raleway_bold,
-                stroke_width=1,
-                stroke_fill=(50, 50, 50, 255)
-            )
+        self.members_per_page = 10
+        self.max_pages = 10
 
-            # Escrevendo nível atual
-            level_str = str(xp_curr_level)
-            draw.text(
-                (
-                    120 / 2 - draw.textsize(level_str, font=self.font_raleway_bold)[0] / 2 + 10,
-                    140
-                ),
-                level_str,
-                fill=(145, 81, 213),
-                font=self.font_raleway_bold
-            )
+    def get_member_name(self, memid: int):
+        user = self.bot.client.get_user(memid)
+        return user.name if user else f'<@{memid}>'
 
-            # Escrevendo progresso de EXP
-            progress_str = f'{member_info.exp}/{xp_level_ceil} XP'
-            draw.text(
-                (
-                    390 - draw.textsize(progress_str, font=self.font_sourcecodepro_bold)[0],
-                    160
-                ),
-                progress_str,
-                fill=(7, 194, 119),
-                font=self.font_sourcecodepro_bold
-            )
+    async def run(self, ctx, args, flags):
+        try:
+            startat = int(flags.get('page', 1)) - 1
+            assert startat >= 0 and startat < self.max_pages
+        except (ValueError, AssertionError):
+            raise CommandError(f'O argumento `--page` precisa ser um número entre 1 e {self.max_pages}.')
 
-            # Salvando em um objeto BytesIO
-            profile_base.save(output, format=prefered_image_output_format.upper())
+        pm = self.bot.plugins.get_plugin_by_type(PProgressionRewarder).manager
+        window = get_activity_window_name(flags)
 
-        await asyncio.get_running_loop().run_in_executor(
-            None,
-            callable_apply_profile_template
+        if window:
+            leaderboard = await pm.get_activity_window(window)
+            title = f'Ranking de EXP recebido {ACTIVITY_WINDOW_DESCRIPTIONS[window]}'
+        else:
+            leaderboard = await pm.get_leaderboard()
+            title = 'Ranking de EXP'
+
+        if not len(leaderboard):
+            return 'Nenhum membro possui EXP até o momento.' if not window else f'Nenhum membro recebeu EXP {ACTIVITY_WINDOW_DESCRIPTIONS[window]}.'
+
+        items = []
+        for page in range(min(self.max_pages, math.ceil(len(leaderboard) / self.members_per_page))):
+            embed = ctx.create_response_embed()
+            embed.title = title
+            embed.description = '\n'.join([
+                f'**#{rank}** {self.get_member_name(memid)} - nível **{MemberInfo.get_level_from_exp(exp)}** ({exp} XP)' if not window else f'**#{rank}** {self.get_member_name(memid)} - **{exp}** XP'
+                for rank, memid, exp in leaderboard.get_page(page * self.members_per_page, self.members_per_page)
+            ])
+
+            items.append(embed)
+
+        return Slider(
+            self.bot,
+            ctx,
+            items,
+            startat=min(startat, len(items) - 1)
         )
 
-        output.seek(0, io.SEEK_SET)
-        return discord.File(
-            output,
-            filename=f'profile.{prefered_image_output_format}'
+class CRank(BotCommand):
+    def __init__(self, bot):
+        super().__init__(
+            bot,
+            name = "rank",
+            aliases = ['rk'],
+            description = "Exibe a posição do próprio autor ou do membro mencionado no ranking global de EXP, ou no ranking das últimas 24 horas (--daily) ou dos últimos 7 dias (--weekly).",
+            usage = '[@Usuario] [--daily|--weekly]'
         )
-        
\ No newline at end of file
+
+    async def run(self, ctx, args, flags):
+        mentions = flags.get('mentions', None)
+        target = mentions[0] if mentions else ctx.author
+
+        pm = self.bot.plugins.get_plugin_by_type(PProgressionRewarder).manager
+        window = get_activity_window_name(flags)
+        leaderboard = await pm.get_activity_window(window) if window else await pm.get_leaderboard()
+        rank = leaderboard.get_rank(target.id)
+
+        if rank is None:
+            return f'{target.name} ainda não possui uma posição no ranking.' if not window else f'{target.name} não recebeu EXP {ACTIVITY_WINDOW_DESCRIPTIONS[window]}.'
+
+        exp = leaderboard.get_score(target.id)
+
+        if window:
+            return f'{target.mention} está na posição **#{rank}** de {len(leaderboard)} com **{exp}** XP recebido {ACTIVITY_WINDOW_DESCRIPTIONS[window]}.'
+
+        return f'{target.mention} está na posição **#{rank}** de {len(leaderboard)} com nível **{MemberInfo.get_level_from_exp(exp)}** ({exp} XP).'
\ No newline at end of file
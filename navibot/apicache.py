@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+
+from navibot.helpers import LRUCache, SingleFlight
+from navibot.util import bytes_string
+
+class ApiCacheEntry:
+    __slots__ = ('data', 'expires_at', 'stale_until')
+
+    def __init__(self, data: bytes, expires_at: float, stale_until: float):
+        self.data = data
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+class ApiCacheStatistics:
+    __slots__ = ('name', 'hits', 'stale_hits', 'misses', 'coalesced', 'refresh_failures')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refresh_failures = 0
+
+    def get_hit_ratio(self):
+        total = self.hits + self.stale_hits + self.misses + self.coalesced
+        return (self.hits + self.stale_hits + self.coalesced) / total if total else 0
+
+# @NOTE:
+# Cache de respostas dos clientes de API (libs/), compartilhado por todos eles e separado por API.
+# - Cada resposta pode ser utilizada por ttl segundos, depois disso, por mais stale_ttl segundos ela ainda é entregue
+#   imediatamente enquanto uma nova requisição a atualiza em segundo plano (stale-while-revalidate).
+# - Requisições idênticas simultâneas compartilham uma única chamada de fetch (single-flight).
+# - Guarda somente os bytes das respostas, limitado por max_bytes (LRU).
+# fetch() deve retornar (bytes, pode ser armazenado).
+class ApiResponseCache:
+    def __init__(self, max_bytes: int):
+        self.entries = LRUCache(max_bytes=max_bytes, sizeof=lambda entry: len(entry.data))
+        self.inflight = SingleFlight()
+        self.statistics = {}
+
+    def get_statistics(self, api: str):
+        try:
+            return self.statistics[api]
+        except KeyError:
+            st = ApiCacheStatistics(api)
+            self.statistics[api] = st
+            return st
+
+    async def get(self, api: str, key: tuple, ttl: float, fetch: callable, stale_ttl: float=0):
+        st = self.get_statistics(api)
+        key = (api, key)
+        entry = self.entries.get(key)
+        now = time.monotonic()
+
+        if entry:
+            if now < entry.expires_at:
+                st.hits += 1
+                return entry.data
+
+            if now < entry.stale_until:
+                st.stale_hits += 1
+                self.refresh(st, key, ttl, stale_ttl, fetch)
+                return entry.data
+
+        if key in self.inflight:
+            st.coalesced += 1
+        else:
+            st.misses += 1
+
+        return await self.inflight.run(key, lambda: self.fetch(key, ttl, stale_ttl, fetch))
+
+    # Roda dentro da task do SingleFlight, o cache é preenchido mesmo se quem iniciou a requisição for cancelado.
+    async def fetch(self, key: tuple, ttl: float, stale_ttl: float, fetch: callable):
+        data, cacheable = await fetch()
+
+        if cacheable:
+            now = time.monotonic()
+            self.entries.put(key, ApiCacheEntry(data, now + ttl, now + ttl + stale_ttl))
+
+        return data
+
+    def refresh(self, st: ApiCacheStatistics, key: tuple, ttl: float, stale_ttl: float, fetch: callable):
+        # Já existe uma requisição para esta chave, ela mesma vai atualizar o cache.
+        if key in self.inflight:
+            return
+
+        task = self.inflight.start(key, lambda: self.fetch(key, ttl, stale_ttl, fetch))
+        task.add_done_callback(lambda t: self.refresh_done(st, t))
+
+    def refresh_done(self, st: ApiCacheStatistics, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            st.refresh_failures += 1
+            logging.warning(f'ApiResponseCache failed to refresh a stale {st.name} response: {type(task.exception()).__name__}: {task.exception()}')
+
+    def reset(self):
+        self.statistics.clear()
+
+    def format_statistics(self):
+        text = f'**ApiResponseCache** {len(self.entries)} resposta(s), {bytes_string(self.entries.curr_bytes)}\n'
+
+        if not self.statistics:
+            return text + 'Nenhuma requisição de API foi registrada até o momento.\n'
+
+        for st in sorted(self.statistics.values(), key=lambda x: x.name):
+            text += f'`{st.name}` acertos: {st.hits} | antigos (revalidando): {st.stale_hits} | falhas: {st.misses} | agrupados: {st.coalesced} | falhas ao revalidar: {st.refresh_failures} | taxa de acerto: {st.get_hit_ratio() * 100:.1f}%\n'
+
+        return text
@@ -0,0 +1,91 @@
+import math
+import numpy as np
+import PIL.Image
+
+from navibot.imaging import decode_image_payload
+
+# Do mais "vazio" para o mais "cheio", no tema escuro do discord o caractere mais cheio é o mais claro.
+ASCII_RAMP = np.array(list(' .:-=+*#%@'))
+
+# Cores do bloco de código ansi do discord (30 até 37) e os RGBs aproximados em que elas são exibidas.
+ANSI_COLORS = np.array((
+    (79, 84, 92),
+    (220, 50, 47),
+    (133, 153, 0),
+    (181, 137, 0),
+    (38, 139, 210),
+    (211, 54, 130),
+    (42, 161, 152),
+    (255, 255, 255)
+), dtype=np.float32)
+
+ANSI_ESCAPES = np.array([f'\u001b[{30 + i}m' for i in range(len(ANSI_COLORS))], dtype=object)
+
+LUMA_WEIGHTS = np.array((.299, .587, .114), dtype=np.float32)
+
+# Um caractere é aproximadamente duas vezes mais alto do que largo.
+CHAR_ASPECT = .5
+
+# Tamanho de um código ANSI de cor (Ex: \u001b[31m), o modo colorido sempre emite pelo menos um no início de cada linha.
+ANSI_ESCAPE_LENGTH = len(ANSI_ESCAPES[0])
+
+# columns * rows caracteres + (rows - 1) quebras de linha + row_overhead caracteres extras por linha.
+def get_ascii_text_length(columns: int, rows: int, row_overhead: int):
+    return rows * (columns + 1 + row_overhead) - 1
+
+def get_ascii_grid(width: int, height: int, budget: int, max_columns: int, row_overhead: int=0):
+    ratio = height / width * CHAR_ASPECT
+    columns = max(1, min(max_columns, width, math.floor(math.sqrt(budget / max(ratio, 1e-3)))))
+    rows = max(1, round(columns * ratio))
+
+    while columns > 1 and get_ascii_text_length(columns, rows, row_overhead) > budget:
+        columns -= 1
+        rows = max(1, round(columns * ratio))
+
+    # Imagens muito altas e estreitas não cabem nem com uma única coluna, então as linhas também são limitadas.
+    rows = max(1, min(rows, height, (budget + 1) // (columns + 1 + row_overhead)))
+    return columns, rows
+
+def render_ascii_grid(img: PIL.Image.Image, columns: int, rows: int, color: bool, invert: bool):
+    # Uma única redução até o tamanho da grade, cada pixel restante é um caractere.
+    arr = np.asarray(img.resize((columns, rows), PIL.Image.Resampling.BOX), dtype=np.float32)
+    rgb = arr[..., :3] * (arr[..., 3:] / 255)
+
+    lum = rgb @ LUMA_WEIGHTS
+
+    if invert:
+        lum = 255 - lum
+
+    chars = ASCII_RAMP[np.rint(lum * ((len(ASCII_RAMP) - 1) / 255)).astype(np.intp)]
+
+    if not color:
+        return '\n'.join(map(''.join, chars))
+
+    # Cor ANSI mais próxima de cada célula, o código só é emitido quando a cor muda dentro da linha.
+    nearest = np.argmin(((rgb[:, :, None, :] - ANSI_COLORS[None, None, :, :]) ** 2).sum(axis=3), axis=2)
+    changed = np.ones(nearest.shape, dtype=bool)
+    changed[:, 1:] = nearest[:, 1:] != nearest[:, :-1]
+
+    cells = np.where(changed, ANSI_ESCAPES[nearest], '') + chars.astype(object)
+    return '\n'.join(map(''.join, cells))
+
+# @NOTE:
+# Retorna a imagem em um bloco de código que cabe em max_length caracteres, a grade é escolhida antes de renderizar.
+# No modo colorido a quantidade de códigos ANSI depende da imagem, se não couber, a grade é reduzida proporcionalmente.
+def render_ascii(payload: tuple, max_length: int, max_columns: int, color: bool, invert: bool):
+    img = decode_image_payload(payload).convert(mode='RGBA')
+    header = '```ansi\n' if color else '```\n'
+    footer = '\n```'
+    budget = max_length - len(header) - len(footer)
+
+    columns, rows = get_ascii_grid(img.width, img.height, budget, max_columns, ANSI_ESCAPE_LENGTH if color else 0)
+    text = render_ascii_grid(img, columns, rows, color, invert)
+
+    # As duas dimensões são reduzidas na mesma proporção (mantendo o aspecto), sempre diminuindo pelo menos uma delas.
+    while len(text) > budget and (columns > 1 or rows > 1):
+        scale = min(.95, math.sqrt(budget / len(text)))
+        columns = max(1, math.floor(columns * scale))
+        rows = max(1, math.floor(rows * scale))
+        text = render_ascii_grid(img, columns, rows, color, invert)
+
+    return header + text + footer
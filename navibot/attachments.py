@@ -0,0 +1,126 @@
+import collections
+
+# Quantas das últimas mensagens de cada canal lembram a sua sequência, o suficiente para as mensagens que chegam durante um comando.
+MAX_RECENT_MESSAGES = 32
+
+class AttachmentRef:
+    __slots__ = ('url', 'size', 'filename', 'message_id', 'sequence')
+
+    def __init__(self, url: str, size: int, filename: str, message_id: int, sequence: int):
+        self.url = url
+        self.size = size
+        self.filename = filename
+        self.message_id = message_id
+        # Número da mensagem dentro do canal (contando desde que começamos a observar ele).
+        self.sequence = sequence
+
+class ChannelAttachments:
+    __slots__ = ('attachments', 'recent', 'seen', 'complete')
+
+    def __init__(self, max_attachments: int):
+        self.attachments = collections.deque(maxlen=max_attachments)
+        # (message_id, sequence) das últimas mensagens, usado para medir a janela a partir da mensagem de referência.
+        self.recent = collections.deque(maxlen=MAX_RECENT_MESSAGES)
+        # Quantas mensagens deste canal já passaram pelo índice.
+        self.seen = 0
+        # Verdadeiro quando sabemos que nenhuma mensagem anterior ao índice interessa (Ex: o histórico já foi lido).
+        self.complete = False
+
+    # Sequência da mensagem informada, None se ela já saiu de recent.
+    def get_sequence(self, message_id: int):
+        # Ainda não passou pelo índice (Ex: o comando foi processado antes), será a próxima.
+        if not self.recent or message_id > self.recent[-1][0]:
+            return self.seen + 1
+
+        for recent_id, sequence in reversed(self.recent):
+            if recent_id == message_id:
+                return sequence
+
+        return None
+
+# @NOTE:
+# Índice dos últimos anexos enviados em cada canal, alimentado pelo evento MESSAGE,
+# substitui a leitura do histórico do canal (requisições à API do discord) ao procurar a última imagem enviada.
+# Cada canal guarda no máximo max_attachments anexos e somente os max_channels canais mais recentes são mantidos.
+class AttachmentIndex:
+    def __init__(self, max_attachments: int=8, max_channels: int=1000):
+        self.max_attachments = max_attachments
+        self.max_channels = max_channels
+        self.channels = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_channel(self, channelid: int, create: bool=False):
+        channel = self.channels.get(channelid, None)
+
+        if channel:
+            self.channels.move_to_end(channelid)
+        elif create:
+            channel = ChannelAttachments(self.max_attachments)
+            self.channels[channelid] = channel
+
+            while len(self.channels) > self.max_channels:
+                self.channels.popitem(last=False)
+
+        return channel
+
+    def add_message(self, message):
+        channel = self.get_channel(message.channel.id, create=True)
+        channel.seen += 1
+        channel.recent.append((message.id, channel.seen))
+
+        for atch in message.attachments:
+            channel.attachments.append(AttachmentRef(atch.url, atch.size, atch.filename, message.id, channel.seen))
+
+    def remove_message(self, message):
+        channel = self.get_channel(message.channel.id)
+
+        if channel and any(atch.message_id == message.id for atch in channel.attachments):
+            channel.attachments = collections.deque(
+                (atch for atch in channel.attachments if atch.message_id != message.id),
+                maxlen=self.max_attachments
+            )
+
+    def mark_complete(self, channelid: int):
+        channel = self.get_channel(channelid)
+
+        if channel:
+            channel.complete = True
+
+    # @NOTE:
+    # Retorna (encontrou, anexo), encontrou é False quando o índice não tem informações suficientes
+    # para responder (canal "frio") e o histórico do canal ainda precisa ser consultado.
+    def find_last_attachment(self, channelid: int, before_message_id: int, limit: int, expected_file_extensions: tuple):
+        channel = self.get_channel(channelid)
+
+        # A janela é medida a partir da mensagem de referência, mensagens que chegarem enquanto o comando roda não a diminuem.
+        sequence = channel.get_sequence(before_message_id) if channel else None
+
+        if sequence is None:
+            self.misses += 1
+            return False, None
+
+        for atch in reversed(channel.attachments):
+            # Só mensagens anteriores à mensagem de referência e dentro das últimas limit mensagens.
+            if atch.message_id >= before_message_id:
+                continue
+
+            if sequence - atch.sequence > limit:
+                break
+
+            if atch.filename.lower().endswith(tuple('.' + ext for ext in expected_file_extensions)):
+                self.hits += 1
+                return True, atch
+
+        # Anexos mais antigos já foram descartados do ring buffer, mas ainda estariam dentro do limite.
+        if len(channel.attachments) == self.max_attachments and sequence - channel.attachments[0].sequence < limit:
+            self.misses += 1
+            return False, None
+
+        # Não encontramos nada, mas só podemos afirmar isso se o índice cobre as últimas limit mensagens.
+        if channel.complete or sequence > limit:
+            self.hits += 1
+            return True, None
+
+        self.misses += 1
+        return False, None
@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import mmap
+import os
+import re
+import tempfile
+
+from navibot.errors import BotError
+
+# @NOTE:
+# Armazenamento de arquivos endereçados pelo seu conteúdo (SHA-256), cada arquivo fica em
+# BLOBS_PATH/ab/abcdef..., sendo assim, dois conteúdos idênticos sempre ocupam o mesmo arquivo,
+# e o banco de dados só precisa guardar a hash.
+class BlobStore:
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def create_digest(data: bytes):
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def is_valid_digest(digest: str):
+        return isinstance(digest, str) and re.match('^[0-9a-f]{64}$', digest) is not None
+
+    def get_blob_path(self, digest: str):
+        # Também previne que uma hash "estranha" vinda do banco acesse outro caminho qualquer.
+        if not self.is_valid_digest(digest):
+            raise BotError(f'A hash `{digest}` não é válida para o armazenamento de arquivos.')
+
+        return os.path.join(self.path, digest[:2], digest)
+
+    def exists(self, digest: str):
+        return os.path.isfile(self.get_blob_path(digest))
+
+    def put(self, data: bytes):
+        digest = self.create_digest(data)
+        path = self.get_blob_path(digest)
+
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Escreve em um arquivo temporário e só depois troca de nome, ninguém pode ler um blob pela metade.
+            fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path))
+
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+
+                os.replace(tmppath, path)
+            except Exception as e:
+                os.unlink(tmppath)
+                raise e
+
+            logging.info(f'BlobStore stored a new blob {digest} ({len(data)} bytes)')
+
+        return digest
+
+    # @NOTE:
+    # Retorna um mmap somente leitura, que pode ser passado diretamente como arquivo para o PIL.Image.open
+    # sem copiar o conteúdo para um BytesIO, quem chamar é responsável por fechá-lo (é um context manager).
+    def open(self, digest: str):
+        with open(self.get_blob_path(digest), 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, digest: str):
+        with self.open(digest) as mm:
+            return mm[:]
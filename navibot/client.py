@@ -12,18 +12,27 @@ import re
 import sys
 import io
 import aiohttp
-import aiomysql
 import PIL.Image
 
 from enum import Enum, auto
 
 from navibot.helpers import IntervalContext
+from navibot.blobstore import BlobStore
+from navibot.attachments import AttachmentIndex
+from navibot.imaging import RenderEngine, ImageValue, ImageResultCache, AnimationReader
+from navibot.httpcache import HttpCache, HttpCacheEntry, get_response_max_age
+from navibot.apicache import ApiResponseCache
+from navibot.ratelimit import HostRateLimiter
 from navibot.parser import CommandParser
-from navibot.util import is_instance, is_subclass, bytes_string
+from navibot.util import is_instance, is_subclass, bytes_string, sniff_image_format, normalize_image_format
 from navibot.errors import *
-from navibot.database.dal import GuildVariableDAL
+from navibot.database.dal import GuildVariableDAL, MemberInfoDAL
+from navibot.database.backend import create_storage_backend
+from navibot.database.instrumentation import QueryStatistics, query_origin
 from navibot.database.models import GuildVariable
 
+from libs.apiclient import ApiError
+
 class IBotNotifiable:
     async def receive_bot_start(self):
         raise NotImplementedError()
@@ -65,10 +74,17 @@ class EmojiType(Enum):
 class ClientEvent(Enum):
     READY               = 'ready'
     MESSAGE             = 'message'
+    MESSAGE_DELETE      = 'message_delete'
     MEMBER_JOIN         = 'member_join'
     REACTION_ADD        = 'reaction_add'
     REACTION_REMOVE     = 'reaction_remove'
 
+# @NOTE:
+# Texto que deve ser enviado como conteúdo da mensagem, nunca dentro de um embed (Ex: blocos de código ANSI, que embeds não colorem),
+# continua sendo uma str, portanto ainda pode ser passado adiante em uma pipeline normalmente.
+class PlainText(str):
+    pass
+
 class Context:
     def __init__(self, bot):
         self.bot = bot
@@ -100,6 +116,12 @@ class BotContext(Context):
         if not self.channel or not self.message:
             raise BotError('É preciso que o contexto possua um canal e uma mensagem para poder obter um anexo.')
 
+        found, atch = self.bot.attachments.find_last_attachment(self.channel.id, self.message.id, limit, expected_file_extensions)
+
+        if found:
+            return atch
+
+        # Canal "frio" (pouco observado desde que o bot iniciou), precisamos consultar o histórico.
         async for message in self.channel.history(limit=limit, before=self.message.created_at):
             for atch in message.attachments:
                 valid = False
@@ -113,6 +135,9 @@ class BotContext(Context):
                 else:
                     return atch
 
+        # Nada nas últimas limit mensagens, daqui em diante o índice já consegue responder sozinho.
+        self.bot.attachments.mark_complete(self.channel.id)
+
     # @NOTE:
     # Atualmente, nós esperamos sempre que um comando volte uma reply, mas nunca uma combinação, Ex: Attachment +
     # Texto de mensagem. Ou seja, se um comando for enviar duas coisas, terá que ser duas chamadas para reply()
@@ -126,7 +151,7 @@ class BotContext(Context):
         if isinstance(response, str) or isinstance(response, list):
             text = ' '.join(response) if isinstance(response, list) else response
             
-            if use_embed_as_default:
+            if use_embed_as_default and not isinstance(response, PlainText):
                 embed = self.create_response_embed()
                 embed.description = text
                 return await target.send(embed=embed)
@@ -139,6 +164,13 @@ class BotContext(Context):
         elif isinstance(response, discord.File):
             return await target.send(file=response)
 
+        elif isinstance(response, ImageValue):
+            # Fim da PIPELINE, só aqui a imagem é codificada.
+            return await target.send(file=discord.File(
+                io.BytesIO(await response.get_data(self.bot.renderer, self.bot.config.get('modules.preferences.default_io_max_output_kb_size', 8192) * 1024)),
+                filename=response.get_filename()
+            ))
+
         elif isinstance(response, Slider):
             return await response.send()
 
@@ -301,37 +333,89 @@ class BotCommand(Command):
     def get_prefered_output_image_format(self):
         return self.bot.config.get('modules.preferences.default_io_image_format', 'png')
 
-    async def get_file_from_url(self, image_url: str, max_size: int=0):
+    def get_prefered_max_output_byte_size(self):
+        return self.bot.config.get('modules.preferences.default_io_max_output_kb_size', 8192) * 1024
+
+    async def get_file_from_url(self, image_url: str, max_size: int=0, formats: tuple=None):
         try:
-            return await self.bot.http.get_file(image_url, max_size=max_size)
+            return await self.bot.http.get_file(image_url, max_size=max_size, formats=formats)
         except asyncio.TimeoutError:
             raise CommandError('Não foi possível obter a imagem através da URL fornecida, o tempo limite da requisição foi atingido.')
         except BotError as e:
             raise CommandError(f"Não foi possível obter a imagem através da URL fornecida, {e}.")
 
-    async def get_image_object_from_bytes(self, image_bytes: io.BytesIO):
+    def get_prefered_max_image_pixels(self):
+        return self.bot.config.get('modules.preferences.default_io_max_image_pixels', 4096 * 4096)
+
+    # @NOTE:
+    # target_size é o tamanho máximo (largura e altura) que o comando realmente vai utilizar, com ele
+    # JPEGs são decodificados já reduzidos (draft, escala 1/2, 1/4 ou 1/8 direto no decoder) e os demais formatos
+    # são reduzidos logo após a decodificação, sem nunca ficarem menores que target_size.
+    # O limite de pixels é verificado somente com o cabeçalho lido, antes de decodificar qualquer coisa.
+    async def get_image_object_from_bytes(self, image_bytes: io.BytesIO, target_size: int=0):
         supported_image_formats = self.get_prefered_supported_image_formats()
+        max_pixels = self.get_prefered_max_image_pixels()
 
         def callable_image_format_is_valid():
             nonlocal image_bytes
-            
+
             try:
                 curr_img = PIL.Image.open(image_bytes)
-                curr_img.load()
+            except PIL.Image.DecompressionBombError:
+                raise CommandError(f'A imagem ultrapassa o limite de {max_pixels} pixels permitido pelo comando.')
             except Exception:
                 raise CommandError('Não foi possível abrir a imagem a partir dos dados recebidos.')
 
             if not curr_img.format or not curr_img.format.lower() in supported_image_formats:
                 raise CommandError(f'O formato da imagem é inválido, este comando só aceita imagens no(s) formato(s): {supported_image_formats}.')
+
+            original_size = curr_img.size
+            # Imagens animadas (GIF/WebP) precisam chegar inteiras ao AnimationReader, que redimensiona cada quadro,
+            # draft/reduce resultariam em uma imagem com apenas o primeiro quadro.
+            animated = getattr(curr_img, 'is_animated', False)
+
+            if target_size > 0 and not animated and curr_img.format == 'JPEG':
+                curr_img.draft(None, (target_size, target_size))
+
+            if curr_img.width * curr_img.height > max_pixels:
+                raise CommandError(f'A imagem possui {original_size[0]}x{original_size[1]} pixels, ultrapassando o limite de {max_pixels} pixels permitido pelo comando.')
+
+            stamp = time.perf_counter()
+
+            try:
+                curr_img.load()
+            except Exception:
+                raise CommandError('Não foi possível abrir a imagem a partir dos dados recebidos.')
+
+            if target_size > 0 and not animated:
+                factor = max(curr_img.size) // target_size
+
+                # Imagens com paleta (Ex: GIF) não são reduzidas aqui, reduce só opera sobre bandas contínuas.
+                if factor >= 2 and curr_img.mode in ('RGB', 'RGBA', 'L', 'LA'):
+                    # A imagem reduzida não carrega o formato da imagem de origem.
+                    format = curr_img.format
+                    curr_img = curr_img.reduce(factor)
+                    curr_img.format = format
+
+            elapsed = time.perf_counter() - stamp
+
+            if curr_img.size != original_size:
+                saved = (original_size[0] * original_size[1] - curr_img.width * curr_img.height) * len(curr_img.getbands())
+                logging.debug(f'Decoded {curr_img.format} image {original_size[0]}x{original_size[1]} as {curr_img.width}x{curr_img.height} in {elapsed * 1000:.1f} ms, saving {bytes_string(saved)}')
             else:
-                return curr_img
+                logging.debug(f'Decoded {curr_img.format} image {curr_img.width}x{curr_img.height} in {elapsed * 1000:.1f} ms')
+
+            return curr_img
 
         return await asyncio.get_running_loop().run_in_executor(
             None,
             callable_image_format_is_valid
         )
 
-    async def get_image_target(self, ctx, args, flags, from_mention: bool=True, from_arg: bool=True, from_pipeline: bool=True, from_history: bool=True, from_author=False):
+    # @NOTE:
+    # Resolve de onde vem a imagem do comando sem decodificá-la, retorna um ImageValue (resultado de outro comando na PIPELINE)
+    # ou os bytes da imagem (io.BytesIO), None caso a origem encontrada não seja permitida pelo comando.
+    async def get_image_source(self, ctx, args, flags, from_mention: bool=True, from_arg: bool=True, from_pipeline: bool=True, from_history: bool=True, from_author=False):
         mentions = flags.get('mentions', None)
         image_bytes = None
         image_url = None
@@ -347,10 +431,17 @@ class BotCommand(Command):
             image_url = str(mentions[0].avatar_url_as(size=prefered_image_size))
         else:
             if args:
+                # Tem uma imagem ainda decodificada nos argumentos (resultado de outro comando de imagem na pipeline)?
+                image_value = [x for x in args if isinstance(x, ImageValue)]
                 # Tem um arquivo já nos argumentos (resultado de outro comando na pipeline)?
                 image_url = [x for x in args if isinstance(x, discord.File)]
-                
-                if image_url:
+
+                if image_value:
+                    if not from_pipeline:
+                        return
+
+                    return image_value[0]
+                elif image_url:
                     if not from_pipeline:
                         return
 
@@ -385,9 +476,60 @@ class BotCommand(Command):
                         raise CommandError(f'Não foi possível encontrar uma imagem suportada no histórico do canal nas últimas {history_max_depth} mensagens.')
 
         if not image_bytes:
-            image_bytes = await self.get_file_from_url(image_url, max_size=max_size)
+            image_bytes = await self.get_file_from_url(image_url, max_size=max_size, formats=supported_image_formats)
+
+        return image_bytes
+
+    async def get_image_from_source(self, source, target_size: int=None):
+        if target_size is None:
+            target_size = self.get_prefered_image_size()
 
-        return await self.get_image_object_from_bytes(image_bytes)
+        if isinstance(source, ImageValue):
+            if source.payload is not None:
+                return source.get_image()
+
+            source = io.BytesIO(source.data)
+
+        return await self.get_image_object_from_bytes(source, target_size=target_size)
+
+    async def get_image_target(self, ctx, args, flags, from_mention: bool=True, from_arg: bool=True, from_pipeline: bool=True, from_history: bool=True, from_author=False, target_size: int=None):
+        source = await self.get_image_source(ctx, args, flags, from_mention=from_mention, from_arg=from_arg, from_pipeline=from_pipeline, from_history=from_history, from_author=from_author)
+
+        if source is None:
+            return None
+
+        return await self.get_image_from_source(source, target_size=target_size)
+
+    # @NOTE:
+    # Para comandos de imagem determinísticos, variant precisa conter tudo (além da imagem) que altera o resultado (flags, tamanho, formato...).
+    # Retorna (chave, resultado em cache ou None), a chave é utilizada depois com ImageResultCache.track().
+    def get_cached_image_result(self, source, variant: tuple):
+        key = (self.name, variant, self.bot.imageresults.get_source_digest(source))
+        return key, self.bot.imageresults.get(key, self.name)
+
+    # @NOTE:
+    # Renderiza curr_img com func(payload, *args) no RenderEngine, imagens animadas (GIF/WebP) têm cada frame
+    # renderizado com a mesma func e voltam como um GIF, a menos que allow_animation seja False (somente o primeiro frame).
+    async def render_image_value(self, curr_img: PIL.Image.Image, format: str, func: callable, *args, allow_animation: bool=True):
+        if allow_animation and getattr(curr_img, 'is_animated', False):
+            reader = AnimationReader(
+                curr_img,
+                self.get_prefered_image_size(),
+                self.bot.config.get('imaging.max_animation_frames', 48),
+                self.bot.config.get('imaging.max_animation_pixels', 256 * 256 * 48)
+            )
+
+            output = await self.bot.renderer.render_animation(self.name, reader, func, *args)
+            return ImageValue(self.name, 'gif', data=output)
+
+        output = await self.bot.renderer.render(
+            self.name,
+            func,
+            await self.bot.renderer.create_payload(curr_img),
+            *args
+        )
+
+        return ImageValue(self.name, format, payload=output)
 
     async def run(self, ctx: BotContext, args: list, flags: dict):
         raise NotImplementedError()
@@ -546,6 +688,12 @@ class Client(discord.Client):
             message=message
         )
 
+    async def on_message_delete(self, message: discord.Message):
+        await self.dispatch_event(
+            ClientEvent.MESSAGE_DELETE, 
+            message=message
+        )
+
     async def on_ready(self):
         await self.dispatch_event(
             ClientEvent.READY
@@ -951,35 +1099,210 @@ class LocalizationManager:
         else:
             return self.translate(self.default_lang, tlkey)
 
+# @NOTE:
+# Contadores alimentados pelo TraceConfig da sessão compartilhada, mostram o quanto as conexões
+# (e os handshakes TCP/TLS) estão sendo reaproveitadas entre os comandos e as APIs.
+class HttpConnectionStatistics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def create_trace_config(self):
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.dns_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.dns_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+
+        return trace_config
+
+    def format_statistics(self):
+        total = self.connections_created + self.connections_reused
+        return f'**Conexões HTTP** requisições: {self.requests} | conexões novas: {self.connections_created} | reaproveitadas: {self.connections_reused} ({self.connections_reused / total * 100 if total else 0:.1f}%) | DNS em cache: {self.dns_hits} | consultas DNS: {self.dns_misses}\n'
+
 class HttpManager:
-    def __init__(self, default_timeout: int=60):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(
-                total=default_timeout
+    # Tamanho de cada leitura do corpo da resposta em get_file.
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, default_timeout: int=60, cache: HttpCache=None, connector_settings: dict=None):
+        self.default_timeout = default_timeout
+        self.connector_settings = connector_settings or {}
+        self.session = None
+        self.statistics = HttpConnectionStatistics()
+
+        # Cache dos arquivos baixados por get_file, pode ser None.
+        self.cache = cache
+
+    # @NOTE:
+    # A sessão (e o seu connector) é única para o bot inteiro, incluindo as APIs em libs/,
+    # e só é criada quando alguém precisar dela, ou seja, já dentro do event loop.
+    def get_session(self):
+        if not self.session or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connector_settings.get('limit', 100),
+                limit_per_host=self.connector_settings.get('limit_per_host', 10),
+                keepalive_timeout=self.connector_settings.get('keepalive_timeout', 30),
+                ttl_dns_cache=self.connector_settings.get('ttl_dns_cache', 300),
+                enable_cleanup_closed=True
             )
-        )
 
-    async def get_file(self, url: str, max_size: int=0):
-        out = io.BytesIO()
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.default_timeout
+                ),
+                trace_configs=[self.statistics.create_trace_config()]
+            )
+
+            logging.info(f'HttpManager created a new shared session with connector settings {self.connector_settings}')
+
+        return self.session
+
+    @staticmethod
+    def check_file_format(head: bytes, formats: tuple):
+        if formats and not sniff_image_format(head) in formats:
+            raise BotError(f'o formato do arquivo não é suportado, os formatos aceitos são: {", ".join(formats)}')
+
+    # @NOTE:
+    # Lê o corpo aos poucos para dentro de um único buffer (alocado de acordo com o Content-Length, quando existir),
+    # abortando assim que max_size for ultrapassado ou, se formats for informado, assim que os primeiros bytes
+    # mostrarem que não é uma imagem aceita, nada além do necessário é baixado.
+    async def read_file_body(self, r: aiohttp.ClientResponse, max_size: int=0, formats: tuple=None):
+        length = r.content_length
+
+        if max_size > 0 and length is not None and length > max_size:
+            raise BotError(f'o tamanho do arquivo ultrapassa o limite permitido de {bytes_string(max_size)}')
+
+        # Sem max_size o Content-Length não passou por nenhuma verificação (o servidor pode informar qualquer valor),
+        # então ele só serve de dica para a alocação inicial, o buffer cresce conforme os dados realmente chegam.
+        if length is not None:
+            buffer = bytearray(length if max_size > 0 else min(length, self.CHUNK_SIZE * 4))
+        else:
+            buffer = bytearray(min(max_size, self.CHUNK_SIZE * 4) if max_size > 0 else self.CHUNK_SIZE)
+
+        pos = 0
+        sniffed = not formats
+
+        async for chunk in r.content.iter_chunked(self.CHUNK_SIZE):
+            end = pos + len(chunk)
+
+            # O Content-Length pode estar errado (ou não existir), então o limite é verificado durante a leitura.
+            if max_size > 0 and end > max_size:
+                raise BotError(f'o tamanho do arquivo ultrapassa o limite permitido de {bytes_string(max_size)}')
+
+            if end > len(buffer):
+                buffer.extend(bytes(max(end - len(buffer), len(buffer))))
+
+            buffer[pos:end] = chunk
+            pos = end
+
+            if not sniffed and pos >= 16:
+                self.check_file_format(bytes(buffer[:16]), formats)
+                sniffed = True
+
+        if not sniffed:
+            self.check_file_format(bytes(buffer[:pos]), formats)
+
+        del buffer[pos:]
+        return buffer
+
+    async def fetch_file(self, url: str, max_size: int=0, formats: tuple=None, cached: HttpCacheEntry=None):
+        headers = cached.get_conditional_headers() if cached and cached.can_revalidate() else {}
+
+        async with self.get_session().get(url, headers=headers) as r:
+            if r.status == 304 and cached:
+                # Não mudou, só renovamos o prazo de validade da versão que já temos.
+                max_age = get_response_max_age(r.headers)
+                cached.expires_at = time.time() + (max_age or 0)
+
+                if self.cache:
+                    self.cache.revalidated += 1
+                    self.cache.bytes_saved += len(cached.data)
+                    await self.cache.put(url, cached)
+
+                return cached
 
-        async with self.session.get(url) as r:
             if r.status != 200:
                 raise BotError(f'A requisição GET para {url} não retornou 200 OK.')
 
-            if max_size > 0:
-                assert 'CONTENT-LENGTH' in r.headers and int(r.headers.get('CONTENT-LENGTH')) <= max_size
-            
-            out.write(await r.read())
+            entry = HttpCacheEntry(
+                await self.read_file_body(r, max_size=max_size, formats=formats),
+                content_type=r.headers.get('Content-Type', None),
+                etag=r.headers.get('ETag', None),
+                last_modified=r.headers.get('Last-Modified', None)
+            )
+
+            max_age = get_response_max_age(r.headers)
+
+        if self.cache:
+            self.cache.misses += 1
+
+            if max_age is not None and (max_age > 0 or entry.can_revalidate()):
+                entry.expires_at = time.time() + max_age
+                await self.cache.put(url, entry)
+
+        return entry
+
+    # @NOTE:
+    # Arquivos ainda válidos são servidos direto do cache (memória ou disco), os expirados são revalidados
+    # com If-None-Match/If-Modified-Since e downloads simultâneos da mesma URL viram uma única requisição.
+    async def get_file(self, url: str, max_size: int=0, formats: tuple=None):
+        formats = tuple(sorted(set(normalize_image_format(x) for x in formats))) if formats else None
+
+        if not self.cache:
+            entry = await self.fetch_file(url, max_size=max_size, formats=formats)
+        else:
+            entry = await self.cache.get(url)
+
+            if entry and entry.is_fresh():
+                self.cache.hits += 1
+                self.cache.bytes_saved += len(entry.data)
+            else:
+                cached = entry
+                entry = await self.cache.coalesce(
+                    (url, max_size, formats),
+                    lambda: self.fetch_file(url, max_size=max_size, formats=formats, cached=cached)
+                )
+
+        # Entradas em cache podem ter sido baixadas por alguém com outros limites.
+        if max_size > 0 and len(entry.data) > max_size:
+            raise BotError(f'o tamanho do arquivo ultrapassa o limite permitido de {bytes_string(max_size)}')
 
-        out.seek(0, io.SEEK_SET)
-        return out
+        self.check_file_format(entry.data[:16], formats)
+
+        return io.BytesIO(entry.data)
 
     async def get_json(self, url: str):
-        async with self.session.get(url) as r:
+        async with self.get_session().get(url) as r:
             return await r.json()
 
     async def close_session(self):
-        return await self.session.close()
+        if self.session:
+            await self.session.close()
+            self.session = None
 
 class Bot:
     def __init__(self, path: str=None, logenable: bool=True, logfile: str=None, loglevel=logging.DEBUG):
@@ -1008,14 +1331,38 @@ class Bot:
         self.commands = CommandDictionary()
         self.clicommands = CommandDictionary()
         self.plugins = PluginsManager()
-        self.http = HttpManager(default_timeout=30)
+        self.http = HttpManager(
+            default_timeout=30,
+            connector_settings=self.config.get('http.connector', {}),
+            cache=HttpCache(
+                max_bytes=self.config.get('http.cache_max_bytes', 16 * 1024 * 1024),
+                disk_path=os.path.join(self.curr_path, self.config.get('http.cache_path')) if self.config.get('http.cache_path', None) else None,
+                disk_max_bytes=self.config.get('http.cache_disk_max_bytes', 128 * 1024 * 1024)
+            )
+        )
         self.guildsettings = GuildSettingsManager(self, self.config.get('guild_settings'), cache_timelimit=60 * 30)
+        self.attachments = AttachmentIndex(
+            max_attachments=self.config.get('modules.preferences.attachment_index_size', 8),
+            max_channels=self.config.get('modules.preferences.attachment_index_channels', 1000)
+        )
+        self.blobs = BlobStore(os.path.join(self.curr_path, self.config.get('storage.blobs_path', 'release/blobs')))
+        self.renderer = RenderEngine(self.curr_path, workers=self.config.get('imaging.workers', 2))
+        self.imageresults = ImageResultCache(self.config.get('imaging.result_cache_max_bytes', 32 * 1024 * 1024))
+        self.apicache = ApiResponseCache(self.config.get('http.api_cache_max_bytes', 8 * 1024 * 1024))
+        self.ratelimiter = HostRateLimiter(
+            self.config.get('http.rate_limits', {}),
+            max_retries=self.config.get('http.retry.max_retries', 3),
+            base_delay=self.config.get('http.retry.base_delay', 0.5),
+            max_delay=self.config.get('http.retry.max_delay', 30),
+            max_queue_seconds=self.config.get('http.retry.max_queue_seconds', 60)
+        )
         self.lm = LocalizationManager(self.guildsettings, f'{self.curr_path}/localization.json', default_lang='pt-BR')
 
         # Objeto de conexão de banco de dados ativo no momento.
         self.connection_pool = None
-        # Objeto de sessão ativa no momento.
-        self.active_http_session = None
+        self.connection_pool_lock = None
+        # Estatísticas de todas as queries executadas pelos DALs.
+        self.querystats = QueryStatistics(slow_query_threshold=self.config.get('database.slow_query_threshold', 250))
         # Event loop
         self.loop = None
 
@@ -1034,8 +1381,13 @@ class Bot:
     async def notify_internal_shutdown(self):
         await self.plugins.receive_bot_shutdown()
         
-        if self.active_http_session:
-            await self.active_http_session.close()
+        await self.http.close_session()
+
+        if self.connection_pool:
+            await self.connection_pool.close()
+            self.connection_pool = None
+
+        self.renderer.shutdown()
 
     async def notify_internal_ready(self):
         await self.plugins.receive_bot_ready()
@@ -1077,6 +1429,8 @@ class Bot:
         # Diferente da implementação por Plugin
         # Esses registros não saem, são nativos
         self.client.register_event(ClientEvent.MESSAGE, self.callable_receive_message)
+        self.client.register_event(ClientEvent.MESSAGE, self.callable_index_message_attachments)
+        self.client.register_event(ClientEvent.MESSAGE_DELETE, self.callable_remove_message_attachments)
         self.client.register_event(ClientEvent.READY, self.callable_receive_ready)
 
     # @NOTE:
@@ -1154,34 +1508,77 @@ class Bot:
         
         # Carrega novamente as chaves
         self.config.load()
+        self.querystats.slow_query_threshold = self.config.get('database.slow_query_threshold', 250)
 
         await self.load_all_modules(True)
 
+    # Sessão HTTP compartilhada (HttpManager), utilizada pelas APIs em libs/.
+    def get_http_session(self):
+        return self.http.get_session()
+
     # @NOTE: 
     # Cria a conexão de forma lazy.
     # 
     # Aqui podemos também executar coisas antes de tentar obter a conexão:
     # Ex: Verificar se está tudo OK, pois todo comando que usará um componente que acessa o banco eventualmente
     # vai chegar neste trecho de código.
+    #
+    # O objeto retornado é um StorageBackend (MySQL ou SQLite, de acordo com database.backend), 
+    # ambos expõem acquire() da mesma forma que o pool do aiomysql.
     async def get_connection_pool(self):
+        if not self.connection_pool_lock:
+            self.connection_pool_lock = asyncio.Lock()
+
         # Se não travarmos isso aqui, pode ser que aconteca 2 vezes ou mais o create_pool()
-        async with asyncio.Lock():
+        async with self.connection_pool_lock:
             if not self.connection_pool:
                 try:
-                    self.connection_pool = await aiomysql.create_pool(
-                        host=self.config.get('database.host', '127.0.0.1'),
-                        port=self.config.get('database.port', 3306),
-                        user=self.config.get('database.user', 'root'),
-                        password=self.config.get('database.password', ''),
-                        db=self.config.get('database.db', 'navibotdb'),
-                        autocommit=True
-                    )
+                    backend = create_storage_backend(self.config.get('database', {}), self.curr_path, statistics=self.querystats)
+                    await backend.connect()
+                    self.connection_pool = backend
                 except Exception as e:
                     logging.error(f'Connecting to the database failed: {e}')
                     raise DatabaseError('Não foi possível conectar-se à base de dados.')
+
+                try:
+                    await self.migrate_legacy_profile_covers(backend)
+                except Exception as e:
+                    logging.exception(f'Migrating legacy profile covers failed, it will be retried on the next connection: {type(e).__name__}: {e}')
             
             return self.connection_pool
 
+    # @NOTE:
+    # Migração única das imagens de fundo guardadas no banco (mem_profile_cover) para o BlobStore,
+    # cada página já migrada é esvaziada no banco, então uma migração interrompida continua de onde parou.
+    async def migrate_legacy_profile_covers(self, backend):
+        migrated = 0
+
+        async with backend.acquire() as conn:
+            d = MemberInfoDAL(conn)
+            columns = await d.get_member_info_columns()
+
+            if not 'mem_profile_cover' in columns:
+                return
+
+            if not 'mem_profile_cover_hash' in columns:
+                logging.warning('Legacy profile covers were found but member_info has no mem_profile_cover_hash column yet, run the dbbootstrap command to migrate them')
+                return
+
+            while True:
+                rows = await d.get_legacy_profile_covers(columns)
+
+                if not rows:
+                    break
+
+                for memid, data in rows:
+                    digest = await asyncio.get_running_loop().run_in_executor(None, self.blobs.put, bytes(data))
+                    await d.migrate_legacy_profile_cover(memid, digest)
+
+                migrated += len(rows)
+
+        if migrated:
+            logging.info(f'Migrated {migrated} legacy profile cover(s) to the BlobStore')
+
     def has_permission_level(self, permissionlevel: PermissionLevel, ctx: BotContext):
         return self.rate_author_permission_level(ctx).value >= permissionlevel.value
 
@@ -1282,6 +1679,20 @@ class Bot:
 
         await self.notify_internal_ready()
 
+    # @NOTE:
+    # Todas as mensagens (inclusive as do próprio bot, Ex: resultado de um comando) alimentam o índice de anexos.
+    async def callable_index_message_attachments(self, kwargs):
+        message = kwargs.get('message')
+
+        if isinstance(message.channel, discord.TextChannel):
+            self.attachments.add_message(message)
+
+    async def callable_remove_message_attachments(self, kwargs):
+        message = kwargs.get('message')
+
+        if isinstance(message.channel, discord.TextChannel):
+            self.attachments.remove_message(message)
+
     async def callable_receive_message(self, kwargs):
         message = kwargs.get('message')
 
@@ -1442,6 +1853,9 @@ class Bot:
             if activator_flags != None:
                 flags['activator_flags'] = activator_flags
 
+            # Qualquer query executada durante este comando será atribuida a ele nas estatísticas.
+            origin_token = query_origin.set(command.name)
+
             try:
                 output = await command.run_wrapper(
                     ctx,
@@ -1453,9 +1867,15 @@ class Bot:
                 logging.warn(f'Command {command.name} threw an error: {e}')
                 # Envia para cima, pois se ignorarmos isso não será mostrado para o usuário
                 raise e
+            except ApiError as e:
+                # Falhas dos serviços externos (libs/) também são mostradas para o usuário.
+                logging.warn(f'Command {command.name} failed to reach an external API: {e}')
+                raise CommandError(str(e))
             except Exception as e:
                 # Por padrão, não mostrar Exceptions vindo de comandos, deixar isso para o console.
                 logging.exception(f'Uncaught exception thrown while running {command.name}: {e}\n\n{traceback.format_exc()}')
+            finally:
+                query_origin.reset(origin_token)
 
         return output
 
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import contextlib
+import os
+
+from navibot.errors import DatabaseError
+
+# @NOTE:
+# Schema utilizado pelo SqliteBackend para inicializar um banco de dados local vazio,
+# a estrutura é equivalente às tabelas esperadas no MySQL pelos DALs.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_settings (
+    gui_id INTEGER NOT NULL,
+    gst_key VARCHAR(64) NOT NULL,
+    gst_value TEXT,
+    gst_value_type INTEGER NOT NULL,
+    PRIMARY KEY (gui_id, gst_key)
+);
+
+CREATE TABLE IF NOT EXISTS member_info (
+    mem_id INTEGER NOT NULL PRIMARY KEY,
+    mem_exp INTEGER NOT NULL DEFAULT 0,
+    mem_profile_cover_hash CHAR(64)
+);
+
+CREATE TABLE IF NOT EXISTS member_activity (
+    mem_id INTEGER NOT NULL,
+    act_hour INTEGER NOT NULL,
+    act_exp INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (mem_id, act_hour)
+);
+
+CREATE INDEX IF NOT EXISTS member_activity_act_hour ON member_activity (act_hour);
+"""
+
+# @NOTE:
+# Mesmo schema para o MySQL, o MysqlBackend só executa isso através do comando dbbootstrap (ou com database.bootstrap ativo),
+# pois exige permissões de DDL que a conta do bot não deveria precisar durante a execução normal.
+# As tabelas já existentes não são alteradas (somente as colunas de SCHEMA_COLUMNS).
+MYSQL_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS guild_settings (
+        gui_id BIGINT NOT NULL,
+        gst_key VARCHAR(64) NOT NULL,
+        gst_value TEXT,
+        gst_value_type INTEGER NOT NULL,
+        PRIMARY KEY (gui_id, gst_key)
+    );""",
+    """CREATE TABLE IF NOT EXISTS member_info (
+        mem_id BIGINT NOT NULL PRIMARY KEY,
+        mem_exp INTEGER NOT NULL DEFAULT 0,
+        mem_profile_cover_hash CHAR(64)
+    );""",
+    """CREATE TABLE IF NOT EXISTS member_activity (
+        mem_id BIGINT NOT NULL,
+        act_hour INTEGER NOT NULL,
+        act_exp INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mem_id, act_hour),
+        INDEX member_activity_act_hour (act_hour)
+    );"""
+)
+
+# @NOTE:
+# Colunas adicionadas após a criação do schema, bancos criados anteriormente recebem elas no bootstrap (MySQL e SQLite).
+SCHEMA_COLUMNS = (
+    ('member_info', 'mem_profile_cover_hash', 'CHAR(64)'),
+)
+
+class StorageConnection:
+    # Utilizado pelos DALs quando não existe uma sintaxe comum entre os bancos (Ex: upsert).
+    dialect = None
+
+    def __init__(self, backend, conn):
+        self.backend = backend
+        self.conn = conn
+
+    async def execute(self, query: str, args: tuple=()):
+        raise NotImplementedError()
+
+    async def executemany(self, query: str, args_list: list):
+        raise NotImplementedError()
+
+    async def fetchone(self, query: str, args: tuple=()):
+        raise NotImplementedError()
+
+    async def fetchall(self, query: str, args: tuple=()):
+        raise NotImplementedError()
+
+    async def get_table_columns(self, table: str):
+        raise NotImplementedError()
+
+    async def add_missing_columns(self, columns: tuple):
+        for table, column, definition in columns:
+            if not column in await self.get_table_columns(table):
+                logging.info(f'{type(self.backend).__name__} is adding missing column {table}.{column}')
+                await self.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition};')
+
+class StorageBackend:
+    def __init__(self, config: dict, curr_path: str, statistics=None):
+        self.config = config
+        self.curr_path = curr_path
+        # QueryStatistics (navibot.database.instrumentation) utilizado pelos DALs, pode ser None.
+        self.statistics = statistics
+
+    async def connect(self):
+        raise NotImplementedError()
+
+    async def close(self):
+        raise NotImplementedError()
+
+    def acquire(self):
+        raise NotImplementedError()
+
+    async def bootstrap_schema(self):
+        raise NotImplementedError()
+
+class MysqlConnection(StorageConnection):
+    dialect = 'mysql'
+
+    async def execute(self, query: str, args: tuple=()):
+        async with self.conn.cursor() as c:
+            return await c.execute(query, args)
+
+    async def executemany(self, query: str, args_list: list):
+        async with self.conn.cursor() as c:
+            return await c.executemany(query, args_list)
+
+    async def fetchone(self, query: str, args: tuple=()):
+        async with self.conn.cursor() as c:
+            await c.execute(query, args)
+            return await c.fetchone()
+
+    async def fetchall(self, query: str, args: tuple=()):
+        async with self.conn.cursor() as c:
+            await c.execute(query, args)
+            return await c.fetchall()
+
+    async def get_table_columns(self, table: str):
+        return [row[0] for row in await self.fetchall(f'SHOW COLUMNS FROM {table};')]
+
+class MysqlBackend(StorageBackend):
+    def __init__(self, config: dict, curr_path: str, statistics=None):
+        super().__init__(config, curr_path, statistics=statistics)
+        self.pool = None
+
+    async def connect(self):
+        import aiomysql
+
+        self.pool = await aiomysql.create_pool(
+            host=self.config.get('host', '127.0.0.1'),
+            port=self.config.get('port', 3306),
+            user=self.config.get('user', 'root'),
+            password=self.config.get('password', ''),
+            db=self.config.get('db', 'navibotdb'),
+            autocommit=True
+        )
+
+        if self.config.get('bootstrap', False):
+            await self.bootstrap_schema()
+
+    async def bootstrap_schema(self):
+        logging.info(f"MysqlBackend is bootstrapping schema on {self.config.get('db', 'navibotdb')}")
+
+        async with self.acquire() as conn:
+            for query in MYSQL_SCHEMA:
+                await conn.execute(query)
+
+            await conn.add_missing_columns(SCHEMA_COLUMNS)
+
+    async def close(self):
+        if self.pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        async with self.pool.acquire() as conn:
+            yield MysqlConnection(self, conn)
+
+class SqliteConnection(StorageConnection):
+    dialect = 'sqlite'
+
+    # @NOTE:
+    # Os DALs escrevem as queries no formato do aiomysql (%s), aqui só traduzimos para o paramstyle do sqlite3 (?).
+    @staticmethod
+    def translate_query(query: str):
+        return query.replace('%s', '?')
+
+    # @NOTE:
+    # Todos compartilham a mesma conexão, então qualquer query executada enquanto um lote do executemany está aberto
+    # entraria na transação dele (e seria confirmada ou desfeita junto), por isso toda query também aguarda o write_lock.
+    async def execute(self, query: str, args: tuple=()):
+        async with self.backend.write_lock:
+            async with self.conn.execute(self.translate_query(query), args) as c:
+                return c.rowcount
+
+    async def executemany(self, query: str, args_list: list):
+        query = self.translate_query(query)
+        batch_size = self.backend.batch_size
+        affected = 0
+
+        # Escritas em lote são feitas dentro de uma única transação por lote, evitando um fsync por linha.
+        async with self.backend.write_lock:
+            for i in range(0, len(args_list), batch_size):
+                await self.conn.execute('BEGIN;')
+
+                try:
+                    async with self.conn.executemany(query, args_list[i:i + batch_size]) as c:
+                        affected += c.rowcount
+                except Exception as e:
+                    await self.conn.execute('ROLLBACK;')
+                    raise e
+                else:
+                    await self.conn.execute('COMMIT;')
+
+        return affected
+
+    async def fetchone(self, query: str, args: tuple=()):
+        async with self.backend.write_lock:
+            async with self.conn.execute(self.translate_query(query), args) as c:
+                return await c.fetchone()
+
+    async def fetchall(self, query: str, args: tuple=()):
+        async with self.backend.write_lock:
+            async with self.conn.execute(self.translate_query(query), args) as c:
+                return await c.fetchall()
+
+    async def get_table_columns(self, table: str):
+        return [row[1] for row in await self.fetchall(f'PRAGMA table_info({table});')]
+
+class SqliteBackend(StorageBackend):
+    def __init__(self, config: dict, curr_path: str, statistics=None):
+        super().__init__(config, curr_path, statistics=statistics)
+        self.path = config.get('path', 'release/navibot.db')
+        self.batch_size = config.get('batch_size', 500)
+        self.bootstrap = config.get('bootstrap', True)
+        self.write_lock = asyncio.Lock()
+        self.conn = None
+
+        if self.path != ':memory:' and not os.path.isabs(self.path):
+            self.path = os.path.join(curr_path, self.path)
+
+    async def connect(self):
+        import aiosqlite
+
+        # isolation_level=None deixa o sqlite3 em modo autocommit, assim como o pool do MySQL.
+        self.conn = await aiosqlite.connect(self.path, isolation_level=None)
+
+        await self.conn.execute('PRAGMA journal_mode=WAL;')
+        await self.conn.execute('PRAGMA synchronous=NORMAL;')
+        await self.conn.execute(f"PRAGMA busy_timeout={self.config.get('busy_timeout', 5000)};")
+
+        if self.bootstrap:
+            await self.bootstrap_schema()
+
+    async def bootstrap_schema(self):
+        logging.info(f'SqliteBackend is bootstrapping schema on {self.path}')
+        await self.conn.executescript(SQLITE_SCHEMA)
+
+        async with self.acquire() as conn:
+            await conn.add_missing_columns(SCHEMA_COLUMNS)
+
+    async def close(self):
+        if self.conn:
+            await self.conn.close()
+            self.conn = None
+
+    # @NOTE:
+    # O aiosqlite já serializa todas as operações em uma única thread por conexão,
+    # portanto não há necessidade de um pool, todos compartilham a mesma conexão.
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield SqliteConnection(self, self.conn)
+
+STORAGE_BACKENDS = {
+    'mysql': MysqlBackend,
+    'sqlite': SqliteBackend
+}
+
+def create_storage_backend(config: dict, curr_path: str, statistics=None):
+    name = config.get('backend', 'mysql')
+
+    try:
+        backend = STORAGE_BACKENDS[name]
+    except KeyError:
+        raise DatabaseError(f'O backend de armazenamento `{name}` não existe.')
+
+    # Cada backend recebe a sua própria seção de configurações, Ex: database.sqlite
+    # O MySQL continua utilizando as chaves diretamente em database por compatibilidade.
+    return backend(config.get(name, config) if name != 'mysql' else config, curr_path, statistics=statistics)
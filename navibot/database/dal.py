@@ -1,16 +1,52 @@
 import logging
-import aiomysql
+import time
 
 from navibot.database.models import GuildVariable, VariableType, MemberInfo
 
 class BaseDAL:
     def __init__(self, conn):
+        # @NOTE:
+        # conn é uma StorageConnection (navibot.database.backend), as queries são escritas
+        # no formato %s e cada backend fica responsável por traduzir para o seu paramstyle.
         self.conn = conn
 
     @staticmethod
     def map_current_object(self, row):
         raise NotImplementedError()
 
+    def record_query(self, query: str, stamp: float, rows: list=None):
+        statistics = self.conn.backend.statistics
+
+        if statistics:
+            statistics.record(query, time.perf_counter() - stamp, rows)
+
+    # @NOTE:
+    # Todas as queries dos DALs passam por aqui, isso nos permite medir o tempo
+    # de cada statement sem precisar alterar cada um dos métodos.
+    async def execute(self, query: str, args: tuple=()):
+        stamp = time.perf_counter()
+        ret = await self.conn.execute(query, args)
+        self.record_query(query, stamp)
+        return ret
+
+    async def executemany(self, query: str, args_list: list):
+        stamp = time.perf_counter()
+        ret = await self.conn.executemany(query, args_list)
+        self.record_query(query, stamp)
+        return ret
+
+    async def fetchone(self, query: str, args: tuple=()):
+        stamp = time.perf_counter()
+        row = await self.conn.fetchone(query, args)
+        self.record_query(query, stamp, [row] if row else None)
+        return row
+
+    async def fetchall(self, query: str, args: tuple=()):
+        stamp = time.perf_counter()
+        rows = await self.conn.fetchall(query, args)
+        self.record_query(query, stamp, rows)
+        return rows
+
 class MemberInfoDAL(BaseDAL):
     def map_current_object(self, row, memid: int):
         return MemberInfo(
@@ -20,13 +56,10 @@ class MemberInfoDAL(BaseDAL):
         )
 
     async def get_member_info(self, memid: int):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='SELECT mem_exp, mem_profile_cover FROM member_info WHERE mem_id = %s LIMIT 1;',
-                args=(memid, )
-            )
-
-            rows = await c.fetchone()
+        rows = await self.fetchone(
+            'SELECT mem_exp, mem_profile_cover_hash FROM member_info WHERE mem_id = %s LIMIT 1;',
+            (memid, )
+        )
         
         return self.map_current_object(
             rows, 
@@ -34,52 +67,157 @@ class MemberInfoDAL(BaseDAL):
         ) if rows else None
 
     async def get_member_info_cacheable(self, memid: int):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='SELECT mem_exp FROM member_info WHERE mem_id = %s LIMIT 1;',
-                args=(memid, )
-            )
-
-            rows = await c.fetchone()
+        rows = await self.fetchone(
+            'SELECT mem_exp FROM member_info WHERE mem_id = %s LIMIT 1;',
+            (memid, )
+        )
         
         return self.map_current_object(
             rows, 
             memid=memid
         ) if rows else None
 
-    async def update_member_info(self, member: MemberInfo):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='UPDATE member_info SET mem_exp = %s, mem_profile_cover = %s WHERE mem_id = %s;',
-                args=(member.exp, member.profile_cover, member.userid)
+    # @NOTE:
+    # Retorna um dicionário mem_id -> mem_exp apenas dos membros que existem, 
+    # utilizado pelo processamento em lote do ProgressionManager (uma query por lote ao invés de uma por membro).
+    async def get_member_exp_batch(self, memids: list, batch_size: int=500):
+        found = {}
+
+        for i in range(0, len(memids), batch_size):
+            chunk = memids[i:i + batch_size]
+
+            for row in await self.fetchall(
+                f"SELECT mem_id, mem_exp FROM member_info WHERE mem_id IN ({', '.join(['%s'] * len(chunk))});",
+                tuple(chunk)
+            ):
+                found[row[0]] = row[1]
+
+        return found
+
+    # @NOTE:
+    # Percorre a tabela inteira em páginas de (mem_id, mem_exp) utilizando o último mem_id como cursor,
+    # assim nunca carregamos a tabela toda de uma vez e cada página é uma busca simples pela chave primária.
+    async def iterate_member_exp(self, page_size: int=1000):
+        last_memid = -1
+
+        while True:
+            rows = await self.fetchall(
+                'SELECT mem_id, mem_exp FROM member_info WHERE mem_id > %s ORDER BY mem_id LIMIT %s;',
+                (last_memid, page_size)
             )
 
+            if not rows:
+                break
+
+            yield rows
+
+            if len(rows) < page_size:
+                break
+
+            last_memid = rows[-1][0]
+
+    async def update_member_info(self, member: MemberInfo):
+        await self.execute(
+            'UPDATE member_info SET mem_exp = %s, mem_profile_cover_hash = %s WHERE mem_id = %s;',
+            (member.exp, member.profile_cover_hash, member.userid)
+        )
+
         return True
 
     async def update_member_info_exp_only(self, member: MemberInfo):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='UPDATE member_info SET mem_exp = %s WHERE mem_id = %s;',
-                args=(member.exp, member.userid)
-            )
+        await self.execute(
+            'UPDATE member_info SET mem_exp = %s WHERE mem_id = %s;',
+            (member.exp, member.userid)
+        )
+
+        return True
+
+    async def update_member_info_exp_only_batch(self, members: list):
+        await self.executemany(
+            'UPDATE member_info SET mem_exp = %s WHERE mem_id = %s;',
+            [(member.exp, member.userid) for member in members]
+        )
 
         return True
 
     async def update_member_info_profile_cover_only(self, member: MemberInfo):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='UPDATE member_info SET mem_profile_cover = %s WHERE mem_id = %s;',
-                args=(member.profile_cover, member.userid)
-            )
+        await self.execute(
+            'UPDATE member_info SET mem_profile_cover_hash = %s WHERE mem_id = %s;',
+            (member.profile_cover_hash, member.userid)
+        )
+
+        return True
+
+    # @NOTE:
+    # Bancos anteriores ao BlobStore guardavam a imagem de fundo inteira em mem_profile_cover,
+    # migrate_legacy_profile_cover move cada uma para o mem_profile_cover_hash e esvazia a coluna antiga (ela não é removida).
+    async def get_member_info_columns(self):
+        return await self.conn.get_table_columns('member_info')
+
+    # columns vem de get_member_info_columns, consultado uma única vez antes de percorrer as páginas.
+    async def get_legacy_profile_covers(self, columns: list, page_size: int=50):
+        if not 'mem_profile_cover' in columns:
+            return []
+
+        return await self.fetchall(
+            'SELECT mem_id, mem_profile_cover FROM member_info WHERE mem_profile_cover IS NOT NULL LIMIT %s;',
+            (page_size, )
+        )
+
+    async def migrate_legacy_profile_cover(self, memid: int, digest: str):
+        # Uma imagem definida depois da atualização (hash já preenchida) tem prioridade sobre a antiga.
+        await self.execute(
+            'UPDATE member_info SET mem_profile_cover_hash = COALESCE(mem_profile_cover_hash, %s), mem_profile_cover = NULL WHERE mem_id = %s;',
+            (digest, memid)
+        )
 
         return True
 
     async def create_member_info(self, member: MemberInfo):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='INSERT INTO member_info (mem_id, mem_exp, mem_profile_cover) VALUES (%s, %s, %s);',
-                args=(member.userid, member.exp, member.profile_cover)
-            )
+        await self.execute(
+            'INSERT INTO member_info (mem_id, mem_exp, mem_profile_cover_hash) VALUES (%s, %s, %s);',
+            (member.userid, member.exp, member.profile_cover_hash)
+        )
+
+        return True
+
+    async def create_member_info_batch(self, members: list):
+        await self.executemany(
+            'INSERT INTO member_info (mem_id, mem_exp, mem_profile_cover_hash) VALUES (%s, %s, %s);',
+            [(member.userid, member.exp, member.profile_cover_hash) for member in members]
+        )
+
+        return True
+
+# @NOTE:
+# Atividade (EXP recebido) de cada membro agrupada por hora (act_hour = timestamp // 3600),
+# alimenta os rankings por janela de tempo do ProgressionManager.
+class MemberActivityDAL(BaseDAL):
+    UPSERT_QUERIES = {
+        'mysql': 'INSERT INTO member_activity (mem_id, act_hour, act_exp) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE act_exp = act_exp + VALUES(act_exp);',
+        'sqlite': 'INSERT INTO member_activity (mem_id, act_hour, act_exp) VALUES (%s, %s, %s) ON CONFLICT (mem_id, act_hour) DO UPDATE SET act_exp = act_exp + excluded.act_exp;'
+    }
+
+    async def get_activity_since(self, since_hour: int):
+        return await self.fetchall(
+            'SELECT mem_id, act_hour, act_exp FROM member_activity WHERE act_hour >= %s;',
+            (since_hour, )
+        )
+
+    # Recebe uma lista de (mem_id, act_hour, act_exp), o EXP é somado ao que já existe naquela hora.
+    async def add_member_activity_batch(self, rows: list):
+        await self.executemany(
+            self.UPSERT_QUERIES[self.conn.dialect],
+            rows
+        )
+
+        return True
+
+    async def remove_activity_before(self, before_hour: int):
+        await self.execute(
+            'DELETE FROM member_activity WHERE act_hour < %s;',
+            (before_hour, )
+        )
 
         return True
 
@@ -100,13 +238,10 @@ class GuildVariableDAL(BaseDAL):
         )
 
     async def get_variable(self, guildid: int, key: str):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='SELECT gst_value, gst_value_type FROM guild_settings WHERE gui_id = %s AND gst_key = %s LIMIT 1;',
-                args=(guildid, key)
-            )
-
-            rows = await c.fetchone()
+        rows = await self.fetchone(
+            'SELECT gst_value, gst_value_type FROM guild_settings WHERE gui_id = %s AND gst_key = %s LIMIT 1;',
+            (guildid, key)
+        )
         
         return self.map_current_object(
             rows, 
@@ -115,14 +250,10 @@ class GuildVariableDAL(BaseDAL):
         ) if rows else None
 
     async def get_all_variables(self, guildid: int):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='SELECT gui_id, gst_key, gst_value, gst_value_type FROM guild_settings WHERE gui_id = %s;',
-                args=(guildid, )
-
-            )
-
-            rows = c.fetchall()
+        rows = await self.fetchall(
+            'SELECT gui_id, gst_key, gst_value, gst_value_type FROM guild_settings WHERE gui_id = %s;',
+            (guildid, )
+        )
         
         return [
             self.map_current_object(
@@ -132,28 +263,25 @@ class GuildVariableDAL(BaseDAL):
         ] if rows else rows
 
     async def create_variable(self, variable: GuildVariable):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='INSERT INTO guild_settings VALUES (%s, %s, %s, %s);',
-                args=(variable.guildid, variable.key, variable.value, variable.valuetype.value)
-            )
+        await self.execute(
+            'INSERT INTO guild_settings VALUES (%s, %s, %s, %s);',
+            (variable.guildid, variable.key, variable.value, variable.valuetype.value)
+        )
 
         return True
 
     async def update_variable(self, variable: GuildVariable):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                query='UPDATE guild_settings SET gst_value = %s, gst_value_type = %s WHERE gui_id = %s AND gst_key = %s;',
-                args=(variable.value, variable.valuetype.value, variable.guildid, variable.key)
-            )
+        await self.execute(
+            'UPDATE guild_settings SET gst_value = %s, gst_value_type = %s WHERE gui_id = %s AND gst_key = %s;',
+            (variable.value, variable.valuetype.value, variable.guildid, variable.key)
+        )
 
         return True
 
     async def remove_variable(self, variable: GuildVariable):
-        async with self.conn.cursor() as c:
-            await c.execute(
-                'DELETE FROM guild_settings WHERE gui_id = %s AND gst_key = %s;',
-                args=(variable.guildid, variable.key)
-            )
+        await self.execute(
+            'DELETE FROM guild_settings WHERE gui_id = %s AND gst_key = %s;',
+            (variable.guildid, variable.key)
+        )
 
         return True
\ No newline at end of file
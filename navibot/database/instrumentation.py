@@ -0,0 +1,145 @@
+import contextvars
+import logging
+import bisect
+import re
+import time
+
+from navibot.util import bytes_string
+
+# @NOTE:
+# Identifica quem originou a query atual (Ex: nome do comando em execução), é propagado automaticamente
+# para as tasks criadas a partir do contexto atual, o que cobre os comandos executados pela PIPELINE.
+query_origin = contextvars.ContextVar('query_origin', default=None)
+
+# Limites superiores (em ms) de cada faixa do histograma de latência, a última faixa é tudo acima disso.
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+def estimate_row_bytes(row):
+    size = 0
+
+    for value in row:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            size += len(value)
+        elif isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif value is not None:
+            size += 8
+
+    return size
+
+class QueryStatement:
+    __slots__ = ('fingerprint', 'calls', 'total_time', 'max_time', 'rows', 'bytes', 'histogram')
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def record(self, elapsed: float, rows: int, nbytes: int):
+        self.calls += 1
+        self.total_time += elapsed
+        self.rows += rows
+        self.bytes += nbytes
+
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+        self.histogram[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, elapsed * 1000)] += 1
+
+    def get_average_time(self):
+        return self.total_time / self.calls if self.calls else 0
+
+    # Retorna o limite superior (em ms) da faixa que contém o percentil informado.
+    def get_percentile_bound(self, percentile: float):
+        target = self.calls * percentile
+        acc = 0
+
+        for i, count in enumerate(self.histogram):
+            acc += count
+
+            if acc >= target:
+                return HISTOGRAM_BUCKETS_MS[i] if i < len(HISTOGRAM_BUCKETS_MS) else None
+
+        return None
+
+class QueryStatistics:
+    def __init__(self, slow_query_threshold: int=250):
+        # Em milissegundos, qualquer query que demorar mais do que isso é registrada no log.
+        self.slow_query_threshold = slow_query_threshold
+        self.statements = {}
+        self.fingerprints = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def create_fingerprint(query: str):
+        fp = re.sub(r"'(?:[^'\\]|\\.)*'", '?', query)
+        fp = re.sub(r'\b\d+\b', '?', fp)
+        fp = fp.replace('%s', '?')
+        # Listas de tamanho variável, Ex: IN (?, ?, ?), não devem gerar um fingerprint diferente para cada tamanho.
+        fp = re.sub(r'\(\s*\?(\s*,\s*\?)*\s*\)', '(...)', fp)
+        return re.sub(r'\s+', ' ', fp).strip()
+
+    def get_fingerprint(self, query: str):
+        # As queries dos DALs são sempre as mesmas strings, não precisamos aplicar as expressões toda vez.
+        try:
+            return self.fingerprints[query]
+        except KeyError:
+            fp = self.create_fingerprint(query)
+            self.fingerprints[query] = fp
+            return fp
+
+    def record(self, query: str, elapsed: float, rows: list=None):
+        fp = self.get_fingerprint(query)
+        nrows = len(rows) if rows else 0
+        nbytes = sum(estimate_row_bytes(row) for row in rows) if rows else 0
+
+        try:
+            statement = self.statements[fp]
+        except KeyError:
+            statement = QueryStatement(fp)
+            self.statements[fp] = statement
+
+        statement.record(elapsed, nrows, nbytes)
+
+        if self.slow_query_threshold > 0 and elapsed * 1000 >= self.slow_query_threshold:
+            logging.warning(f'Slow query took {elapsed * 1000:.1f} ms ({nrows} row(s), {nbytes} byte(s)) originated from {query_origin.get() or "unknown"}: {fp}')
+
+    def get_top_statements(self, n: int=10):
+        return sorted(self.statements.values(), key=lambda x: x.total_time, reverse=True)[:n]
+
+    def reset(self):
+        self.statements.clear()
+        self.started_at = time.time()
+
+    # O texto nunca passa de max_length caracteres (limite de uma mensagem do discord), statements que não couberem são omitidos.
+    def format_statistics(self, top: int=10, max_length: int=2000):
+        statements = self.get_top_statements(top)
+
+        if not statements:
+            return 'Nenhuma query foi registrada até o momento.'
+
+        entries = []
+
+        for st in statements:
+            p95 = st.get_percentile_bound(.95)
+
+            entries.append(
+                f'`{st.fingerprint[:120]}`\n'
+                f'chamadas: {st.calls} | total: {st.total_time * 1000:.1f} ms | média: {st.get_average_time() * 1000:.2f} ms | p95: {f"<= {p95} ms" if p95 else f"> {HISTOGRAM_BUCKETS_MS[-1]} ms"} | max: {st.max_time * 1000:.1f} ms | linhas: {st.rows} | {bytes_string(st.bytes)}\n\n'
+            )
+
+        while True:
+            omitted = len(statements) - len(entries)
+            text = f'**Top {len(entries)} statement(s) por tempo total** (limite lento: {self.slow_query_threshold} ms)\n\n' + ''.join(entries)
+
+            if omitted:
+                text += f'... {omitted} statement(s) omitido(s) por não caberem na mensagem.'
+
+            if len(text) <= max_length or len(entries) <= 1:
+                return text[:max_length]
+
+            entries.pop()
@@ -41,10 +41,11 @@ class GuildVariable:
         return self.value
 
 class MemberInfo:
-    def __init__(self, userid: int, exp: int, profile_cover: bytes):
+    def __init__(self, userid: int, exp: int, profile_cover_hash: str):
         self.userid = userid
         self.exp = exp
-        self.profile_cover = profile_cover
+        # Hash do arquivo no BlobStore, a imagem em si não fica no banco.
+        self.profile_cover_hash = profile_cover_hash
 
     @staticmethod
     def get_level_from_exp(exp: int):
@@ -61,4 +62,4 @@ class MemberInfo:
         return self.get_exp_required_for_level(self.get_current_level() + 1) - self.exp
 
     def has_profile_cover(self):
-        return self.profile_cover is not None
\ No newline at end of file
+        return self.profile_cover_hash is not None
\ No newline at end of file
@@ -0,0 +1,223 @@
+import math
+import numpy as np
+import PIL.Image
+
+from navibot.errors import CommandError
+from navibot.util import normalize_image_max_size
+from navibot.imaging import decode_image_payload, encode_image_payload
+
+# Quantidade máxima de filtros em uma única especificação (depois de expandir os filtros compostos).
+MAX_FILTER_CHAIN = 16
+
+# Pesos de luminância (ITU-R BT.601), cada linha da matriz de escala de cinza é igual.
+LUMA_WEIGHTS = np.array((.299, .587, .114), dtype=np.float32)
+
+def get_box_blur_axis(arr: np.ndarray, radius: int, axis: int):
+    # Média móvel através da soma acumulada, o custo não depende do raio.
+    size = radius * 2 + 1
+    pad = [(0, 0)] * arr.ndim
+    pad[axis] = (radius + 1, radius)
+    acc = np.cumsum(np.pad(arr, pad, mode='edge'), axis=axis, dtype=np.float32)
+    n = arr.shape[axis]
+
+    hi = [slice(None)] * arr.ndim
+    lo = [slice(None)] * arr.ndim
+    hi[axis] = slice(size, size + n)
+    lo[axis] = slice(0, n)
+
+    return (acc[tuple(hi)] - acc[tuple(lo)]) / size
+
+def get_box_blur(arr: np.ndarray, radius: int):
+    return get_box_blur_axis(get_box_blur_axis(arr, radius, 0), radius, 1)
+
+def apply_blur(arr: np.ndarray, value: float):
+    radius = max(1, round(value))
+
+    # Três passadas de box blur se aproximam bastante de um gaussian blur.
+    for i in range(3):
+        arr = get_box_blur(arr, radius)
+
+    return arr
+
+def apply_sharpen(arr: np.ndarray, value: float):
+    arr[..., :3] += value * (arr[..., :3] - get_box_blur(arr[..., :3], 1))
+    return arr
+
+def apply_pixelate(arr: np.ndarray, value: float):
+    block = max(2, round(value))
+    h, w, c = arr.shape
+    bh, bw = math.ceil(h / block), math.ceil(w / block)
+
+    # Completa a imagem até um múltiplo do bloco e tira a média de cada bloco de uma vez.
+    padded = np.pad(arr, ((0, bh * block - h), (0, bw * block - w), (0, 0)), mode='edge')
+    means = padded.reshape(bh, block, bw, block, c).mean(axis=(1, 3))
+
+    return np.repeat(np.repeat(means, block, axis=0), block, axis=1)[:h, :w]
+
+def apply_posterize(arr: np.ndarray, value: float):
+    step = 255 / (max(2, round(value)) - 1)
+    arr[..., :3] = np.round(arr[..., :3] / step) * step
+    return arr
+
+def get_invert_matrix(value: float):
+    return -np.eye(3, dtype=np.float32), np.full(3, 255, dtype=np.float32)
+
+def get_grayscale_matrix(value: float):
+    return np.tile(LUMA_WEIGHTS, (3, 1)), np.zeros(3, dtype=np.float32)
+
+def get_sepia_matrix(value: float):
+    return np.array((
+        (.393, .769, .189),
+        (.349, .686, .168),
+        (.272, .534, .131)
+    ), dtype=np.float32), np.zeros(3, dtype=np.float32)
+
+def get_brightness_matrix(value: float):
+    return np.eye(3, dtype=np.float32) * value, np.zeros(3, dtype=np.float32)
+
+def get_contrast_matrix(value: float):
+    return np.eye(3, dtype=np.float32) * value, np.full(3, 128 * (1 - value), dtype=np.float32)
+
+def get_saturate_matrix(value: float):
+    return (1 - value) * np.tile(LUMA_WEIGHTS, (3, 1)) + value * np.eye(3, dtype=np.float32), np.zeros(3, dtype=np.float32)
+
+def get_hue_matrix(value: float):
+    # Mesma matriz de rotação de matiz utilizada pelo feColorMatrix (SVG/CSS).
+    c = math.cos(math.radians(value))
+    s = math.sin(math.radians(value))
+
+    return np.array((
+        (.213 + c * .787 - s * .213, .715 - c * .715 - s * .715, .072 - c * .072 + s * .928),
+        (.213 - c * .213 + s * .143, .715 + c * .285 + s * .140, .072 - c * .072 - s * .283),
+        (.213 - c * .213 - s * .787, .715 - c * .715 + s * .715, .072 + c * .928 + s * .072)
+    ), dtype=np.float32), np.zeros(3, dtype=np.float32)
+
+class ImageFilter:
+    __slots__ = ('name', 'description', 'default', 'min_value', 'max_value', 'get_matrix', 'apply', 'expand')
+
+    def __init__(self, name: str, description: str, default: float=None, min_value: float=None, max_value: float=None, get_matrix: callable=None, apply: callable=None, expand: callable=None):
+        self.name = name
+        self.description = description
+        self.default = default
+        self.min_value = min_value
+        self.max_value = max_value
+        # Filtros de cor afins (x * M + b) podem ser fundidos em uma única matriz.
+        self.get_matrix = get_matrix
+        # Filtros que dependem da vizinhança de cada pixel precisam de uma passada própria.
+        self.apply = apply
+        # Filtros compostos são só uma sequência de outros filtros.
+        self.expand = expand
+
+    def get_usage_text(self):
+        if self.default is None:
+            return f'`{self.name}` {self.description}'
+
+        return f'`{self.name}[={self.default}]` {self.description} ({self.min_value} até {self.max_value})'
+
+FILTERS = {f.name: f for f in (
+    ImageFilter('invert', 'inverte as cores.', get_matrix=get_invert_matrix),
+    ImageFilter('grayscale', 'escala de cinza.', get_matrix=get_grayscale_matrix),
+    ImageFilter('sepia', 'tons de sépia.', get_matrix=get_sepia_matrix),
+    ImageFilter('brightness', 'multiplica o brilho.', 1.3, 0, 4, get_matrix=get_brightness_matrix),
+    ImageFilter('contrast', 'multiplica o contraste.', 1.5, 0, 4, get_matrix=get_contrast_matrix),
+    ImageFilter('saturate', 'multiplica a saturação.', 2, 0, 8, get_matrix=get_saturate_matrix),
+    ImageFilter('hue', 'gira a matiz em graus.', 90, -360, 360, get_matrix=get_hue_matrix),
+    ImageFilter('blur', 'desfoque com o raio informado.', 2, 1, 16, apply=apply_blur),
+    ImageFilter('sharpen', 'realça os contornos.', 1, 0, 8, apply=apply_sharpen),
+    ImageFilter('pixelate', 'blocos com o tamanho informado.', 8, 2, 64, apply=apply_pixelate),
+    ImageFilter('posterize', 'reduz a quantidade de tons por cor.', 4, 2, 64, apply=apply_posterize),
+    ImageFilter('deepfry', 'frita a imagem.', 1, 0, 4, expand=lambda v: (('saturate', 1 + 1.5 * v), ('contrast', 1 + v), ('sharpen', 2 * v), ('posterize', max(2, 24 - 4 * v))))
+)}
+
+# @NOTE:
+# Interpreta uma especificação como "sepia,pixelate=8,blur=2" em uma lista de (filtro, valor),
+# filtros compostos (Ex: deepfry) já são expandidos aqui.
+def parse_filter_chain(spec: str):
+    chain = []
+
+    for item in spec.split(','):
+        item = item.strip().lower()
+
+        if not item:
+            continue
+
+        name, sep, value = item.partition('=')
+        f = FILTERS.get(name, None)
+
+        if not f:
+            raise CommandError(f'O filtro `{name}` não existe, utilize `--list` para ver os filtros disponíveis.')
+
+        if f.default is None:
+            if sep:
+                raise CommandError(f'O filtro `{name}` não recebe nenhum valor.')
+
+            value = None
+        elif sep:
+            try:
+                value = float(value)
+            except ValueError:
+                raise CommandError(f'O valor `{value}` do filtro `{name}` não é um número válido.')
+
+            if not math.isfinite(value) or value < f.min_value or value > f.max_value:
+                raise CommandError(f'O valor do filtro `{name}` precisa estar entre {f.min_value} e {f.max_value}.')
+        else:
+            value = f.default
+
+        chain.extend(f.expand(value) if f.expand else ((name, value), ))
+
+    if not chain:
+        raise CommandError('É preciso informar pelo menos um filtro.')
+
+    if len(chain) > MAX_FILTER_CHAIN:
+        raise CommandError(f'São permitidos no máximo {MAX_FILTER_CHAIN} filtros por vez.')
+
+    return chain
+
+# @NOTE:
+# "Compila" a lista de filtros em estágios, filtros de cor consecutivos viram uma única matriz 3x3 + deslocamento
+# (M2 * (M1 * x + b1) + b2 = (M2 * M1) * x + (M2 * b1 + b2)), então sepia,invert,contrast é uma única passada sobre os pixels.
+# Os valores intermediários não são saturados entre os filtros fundidos, somente no final.
+def compile_filter_chain(chain: list):
+    stages = []
+    matrix = None
+    offset = None
+
+    for name, value in chain:
+        f = FILTERS[name]
+
+        if f.get_matrix:
+            m, b = f.get_matrix(value)
+
+            if matrix is None:
+                matrix, offset = m, b
+            else:
+                matrix, offset = m @ matrix, m @ offset + b
+        else:
+            if matrix is not None:
+                stages.append(('matrix', matrix, offset))
+                matrix = offset = None
+
+            stages.append(('apply', name, value))
+
+    if matrix is not None:
+        stages.append(('matrix', matrix, offset))
+
+    return stages
+
+# Roda dentro do RenderEngine, a imagem é redimensionada uma única vez antes de todos os filtros.
+def render_filter_chain(payload: tuple, max_size: int, stages: list):
+    curr_img = normalize_image_max_size(decode_image_payload(payload).convert(mode='RGBA'), max_size)
+    arr = np.asarray(curr_img, dtype=np.float32)
+
+    for stage in stages:
+        if stage[0] == 'matrix':
+            _, matrix, offset = stage
+            rgb = arr[..., :3] @ matrix.T
+            rgb += offset
+            arr[..., :3] = rgb
+        else:
+            _, name, value = stage
+            arr = FILTERS[name].apply(arr, value)
+
+    arr = np.clip(arr, 0, 255, out=arr).astype(np.uint8)
+    return encode_image_payload(PIL.Image.fromarray(arr))
@@ -0,0 +1,152 @@
+import math
+import PIL.Image
+import PIL.ImageDraw
+
+from navibot.errors import CommandError
+from navibot.imaging import worker_assets, get_asset_font, encode_image_payload
+
+# Fontes disponíveis para o textimage (repo/font).
+TEXT_FONTS = {
+    'raleway': 'repo/font/Raleway-Regular.ttf',
+    'raleway-bold': 'repo/font/Raleway-Bold.ttf',
+    'raleway-light': 'repo/font/Raleway-Light.ttf',
+    'sourcecodepro': 'repo/font/SourceCodePro-Bold.otf'
+}
+
+# Um atlas que passar disso (Ex: muitos caracteres diferentes) é esvaziado e volta a ser preenchido sob demanda.
+MAX_ATLAS_GLYPHS = 2048
+
+class Glyph:
+    __slots__ = ('mask', 'stroke_mask', 'offset', 'advance')
+
+    def __init__(self, mask: PIL.Image.Image, stroke_mask: PIL.Image.Image, offset: tuple, advance: float):
+        self.mask = mask
+        self.stroke_mask = stroke_mask
+        self.offset = offset
+        self.advance = advance
+
+# @NOTE:
+# Atlas de glifos de uma fonte (fonte, tamanho, contorno), cada caractere é rasterizado pelo FreeType uma única vez,
+# depois disso desenhar um texto é só colar as máscaras já prontas (cópias de memória feitas pelo PIL),
+# e medir um texto é só somar os avanços já conhecidos.
+# Não aplicamos kerning entre pares de caracteres, a diferença é imperceptível nas fontes do repo.
+class GlyphAtlas:
+    def __init__(self, font, stroke_width: int=0):
+        self.font = font
+        self.stroke_width = stroke_width
+        self.glyphs = {}
+
+        ascent, descent = font.getmetrics()
+        self.line_height = ascent + descent + stroke_width * 2
+
+    def rasterize(self, char: str):
+        advance = self.font.getlength(char)
+        left, top, right, bottom = self.font.getbbox(char, stroke_width=self.stroke_width)
+
+        # Espaços e caracteres sem desenho só avançam a posição.
+        if right <= left or bottom <= top:
+            return Glyph(None, None, (0, 0), advance)
+
+        size = (right - left, bottom - top)
+        mask = PIL.Image.new('L', size, 0)
+        PIL.ImageDraw.Draw(mask).text((-left, -top), char, font=self.font, fill=255)
+
+        stroke_mask = None
+
+        if self.stroke_width:
+            stroke_mask = PIL.Image.new('L', size, 0)
+            PIL.ImageDraw.Draw(stroke_mask).text((-left, -top), char, font=self.font, fill=255, stroke_width=self.stroke_width, stroke_fill=255)
+
+        return Glyph(mask, stroke_mask, (left, top), advance)
+
+    def get_glyph(self, char: str):
+        try:
+            return self.glyphs[char]
+        except KeyError:
+            if len(self.glyphs) >= MAX_ATLAS_GLYPHS:
+                self.glyphs.clear()
+
+            glyph = self.rasterize(char)
+            self.glyphs[char] = glyph
+            return glyph
+
+    def measure(self, text: str):
+        return sum(self.get_glyph(char).advance for char in text)
+
+    # Quebra o texto em linhas de no máximo max_width pixels, palavras maiores que a linha inteira são quebradas por caractere.
+    def layout(self, text: str, max_width: int):
+        lines = []
+        space = self.get_glyph(' ').advance
+
+        for paragraph in text.split('\n'):
+            line = ''
+            width = 0
+
+            for word in paragraph.split(' '):
+                word_width = self.measure(word)
+
+                if line and width + space + word_width <= max_width:
+                    line += ' ' + word
+                    width += space + word_width
+                    continue
+
+                if line:
+                    lines.append(line)
+
+                line = ''
+                width = 0
+
+                for char in word:
+                    advance = self.get_glyph(char).advance
+
+                    if line and width + advance > max_width:
+                        lines.append(line)
+                        line = ''
+                        width = 0
+
+                    line += char
+                    width += advance
+
+            lines.append(line)
+
+        return lines
+
+    def draw(self, canvas: PIL.Image.Image, lines: list, origin: tuple, fill: tuple, stroke_fill: tuple):
+        # O contorno de todos os glifos vem antes, para que ele nunca cubra o preenchimento de um glifo vizinho.
+        passes = ((True, stroke_fill), (False, fill)) if self.stroke_width else ((False, fill), )
+
+        for use_stroke, color in passes:
+            y = origin[1]
+
+            for line in lines:
+                x = origin[0]
+
+                for char in line:
+                    glyph = self.get_glyph(char)
+                    mask = glyph.stroke_mask if use_stroke else glyph.mask
+
+                    if mask:
+                        canvas.paste(color, (round(x + glyph.offset[0]), y + glyph.offset[1]), mask)
+
+                    x += glyph.advance
+
+                y += self.line_height
+
+def get_glyph_atlas(path: str, size: int, stroke_width: int):
+    return worker_assets.get(('atlas', path, size, stroke_width), lambda: GlyphAtlas(get_asset_font(path, size), stroke_width))
+
+def render_text_image(text: str, font_name: str, size: int, max_width: int, max_lines: int):
+    atlas = get_glyph_atlas(TEXT_FONTS[font_name], size, max(1, size // 16))
+    lines = atlas.layout(text, max_width)
+
+    if len(lines) > max_lines:
+        raise CommandError(f'O texto informado ocupa mais do que {max_lines} linhas com este tamanho de fonte.')
+
+    padding = math.ceil(size / 4)
+    width = math.ceil(max(atlas.measure(line) for line in lines)) + atlas.stroke_width * 2 + padding * 2
+    height = atlas.line_height * len(lines) + padding * 2
+
+    canvas = PIL.Image.new('RGBA', (max(1, width), max(1, height)), (0, 0, 0, 0))
+    atlas.draw(canvas, lines, (padding + atlas.stroke_width, padding), (255, 255, 255, 255), (0, 0, 0, 255))
+
+    return encode_image_payload(canvas)
@@ -1,5 +1,10 @@
 import asyncio
+import collections
+import hashlib
+import tempfile
+import threading
 import time
+import os
 
 class TimeoutContext:
     def __init__(self, waitfor: int, callable: callable, callback: callable=None, **kwargs):
@@ -63,4 +68,228 @@ class IntervalContext(TimeoutContext):
             self.running_task = None
 
             if self.callback:
-                await self.callback(self, self.kwargs)
\ No newline at end of file
+                await self.callback(self, self.kwargs)
+
+# @NOTE:
+# Cache LRU simples, pode ser limitado por quantidade de itens e/ou quantidade de bytes,
+# neste último caso, é preciso informar sizeof para calcular o tamanho de cada valor.
+class LRUCache:
+    def __init__(self, max_items: int=0, max_bytes: int=0, sizeof: callable=None):
+        assert not max_bytes or sizeof
+        
+        self.items = collections.OrderedDict()
+        self.sizes = {}
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.curr_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.sizeof else 0
+
+        # Não adianta guardar algo maior do que o próprio cache, só iria esvaziar todo o resto.
+        if self.max_bytes and size > self.max_bytes:
+            return False
+
+        if key in self.items:
+            self.remove(key)
+
+        self.items[key] = value
+        self.sizes[key] = size
+        self.curr_bytes += size
+
+        while self.items and ((self.max_items and len(self.items) > self.max_items) or (self.max_bytes and self.curr_bytes > self.max_bytes)):
+            self.remove(next(iter(self.items)))
+
+        return True
+
+    def remove(self, key):
+        try:
+            del self.items[key]
+        except KeyError:
+            return False
+
+        self.curr_bytes -= self.sizes.pop(key)
+        return True
+
+    def clear(self):
+        self.items.clear()
+        self.sizes.clear()
+        self.curr_bytes = 0
+
+    def get_hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+# @NOTE:
+# Cache em disco para valores em bytes, cada chave vira um arquivo (sha256 da chave) dentro de path,
+# limitado por max_bytes (os arquivos menos utilizados são removidos primeiro).
+# Todos os métodos fazem I/O bloqueante, portanto devem ser chamados através de um executor.
+class DiskCache:
+    def __init__(self, path: str, max_bytes: int=0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.index = None
+        self.curr_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_file_name(key):
+        return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+
+    def load_index(self):
+        if self.index is not None:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        entries = []
+
+        for entry in os.scandir(self.path):
+            if entry.is_file() and not entry.name.startswith('tmp'):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name, st.st_size))
+
+        # O índice começa na ordem da última modificação, que é o mais próximo de "último uso" que temos.
+        self.index = collections.OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.curr_bytes = sum(self.index.values())
+
+    def get(self, key, default=None):
+        name = self.get_file_name(key)
+
+        with self.lock:
+            self.load_index()
+
+            if not name in self.index:
+                return default
+
+            self.index.move_to_end(name)
+
+        try:
+            with open(os.path.join(self.path, name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            with self.lock:
+                self.curr_bytes -= self.index.pop(name, 0)
+
+            return default
+
+    def put(self, key, data: bytes):
+        if self.max_bytes and len(data) > self.max_bytes:
+            return False
+
+        name = self.get_file_name(key)
+
+        with self.lock:
+            self.load_index()
+
+        fd, tmppath = tempfile.mkstemp(dir=self.path)
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+
+            os.replace(tmppath, os.path.join(self.path, name))
+        except Exception as e:
+            os.unlink(tmppath)
+            raise e
+
+        with self.lock:
+            self.curr_bytes += len(data) - self.index.pop(name, 0)
+            self.index[name] = len(data)
+
+            while self.max_bytes and self.curr_bytes > self.max_bytes and self.index:
+                oldest, size = self.index.popitem(last=False)
+                self.curr_bytes -= size
+
+                try:
+                    os.unlink(os.path.join(self.path, oldest))
+                except FileNotFoundError:
+                    pass
+
+        return True
+
+# @NOTE:
+# Token bucket, cada consumo gasta tokens que são repostos continuamente a uma taxa de rate tokens por segundo,
+# até no máximo capacity (rajada permitida), o estado é só um número e um timestamp, nada de listas de eventos.
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float=None):
+        now = now if now is not None else time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def consume(self, amount: float=1, now: float=None):
+        self.refill(now)
+
+        if self.tokens < amount:
+            return False
+
+        self.tokens -= amount
+        return True
+
+    # Quantos segundos faltam para que amount tokens estejam disponíveis.
+    def get_wait_time(self, amount: float=1, now: float=None):
+        self.refill(now)
+        return max(0, (amount - self.tokens) / self.rate) if self.rate > 0 else 0
+
+# @NOTE:
+# Chamadas simultâneas com a mesma chave compartilham uma única execução de fetch (single-flight).
+# O fetch roda em uma task própria e todos, inclusive quem o iniciou, só aguardam essa task através do shield,
+# então cancelar qualquer um deles nunca cancela (nem propaga CancelledError para) o resultado dos outros.
+class SingleFlight:
+    def __init__(self):
+        self.inflight = {}
+
+    def __contains__(self, key):
+        return key in self.inflight
+
+    def __len__(self):
+        return len(self.inflight)
+
+    # Retorna a task em andamento para esta chave, criando uma nova caso não exista.
+    def start(self, key, fetch: callable):
+        task = self.inflight.get(key, None)
+
+        if not task:
+            task = asyncio.ensure_future(fetch())
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self.done(key, t))
+
+        return task
+
+    def done(self, key, task: asyncio.Task):
+        if self.inflight.get(key, None) is task:
+            del self.inflight[key]
+
+        # Se ninguém estiver aguardando, não queremos o aviso de exceção nunca recuperada.
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key, fetch: callable):
+        return await asyncio.shield(self.start(key, fetch))
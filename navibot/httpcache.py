@@ -0,0 +1,163 @@
+import asyncio
+import email.utils
+import logging
+import json
+import time
+import re
+
+from navibot.helpers import LRUCache, DiskCache, SingleFlight
+from navibot.util import bytes_string
+
+# Tempo máximo (em segundos) que uma resposta sem max-age/Expires é considerada atual pela heurística do Last-Modified.
+HEURISTIC_MAX_AGE = 86400
+
+class HttpCacheEntry:
+    __slots__ = ('data', 'content_type', 'etag', 'last_modified', 'expires_at')
+
+    def __init__(self, data: bytes, content_type: str=None, etag: str=None, last_modified: str=None, expires_at: float=0):
+        self.data = data
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+    def can_revalidate(self):
+        return self.etag is not None or self.last_modified is not None
+
+    def get_conditional_headers(self):
+        headers = {}
+
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+    # No disco cada entrada é um cabeçalho JSON em uma linha, seguido do conteúdo.
+    def serialize(self):
+        return json.dumps({
+            'content_type': self.content_type,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'expires_at': self.expires_at
+        }).encode('utf-8') + b'\n' + self.data
+
+    @staticmethod
+    def deserialize(raw: bytes):
+        header, _, data = raw.partition(b'\n')
+        return HttpCacheEntry(data, **json.loads(header.decode('utf-8')))
+
+# @NOTE:
+# Retorna por quantos segundos a resposta pode ser utilizada sem revalidar (0 = sempre revalidar),
+# ou None caso ela não possa ser armazenada de forma alguma.
+# private é ignorado, ele só proíbe caches compartilhados (CDNs, proxies) e este cache é exclusivo do bot.
+def get_response_max_age(headers):
+    cache_control = headers.get('Cache-Control', '').lower()
+
+    if 'no-store' in cache_control:
+        return None
+
+    if 'no-cache' in cache_control:
+        return 0
+
+    m = re.search(r'max-age\s*=\s*(\d+)', cache_control)
+
+    if m:
+        return int(m.group(1))
+
+    expires = headers.get('Expires', None)
+
+    if expires:
+        try:
+            return max(0, email.utils.parsedate_to_datetime(expires).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+
+    last_modified = headers.get('Last-Modified', None)
+
+    if last_modified:
+        # Heurística comum: 10% do tempo desde a última modificação.
+        try:
+            age = time.time() - email.utils.parsedate_to_datetime(last_modified).timestamp()
+            return max(0, min(HEURISTIC_MAX_AGE, age / 10))
+        except (TypeError, ValueError):
+            return 0
+
+    return 0 if 'ETag' in headers else None
+
+class HttpCache:
+    def __init__(self, max_bytes: int=0, disk_path: str=None, disk_max_bytes: int=0):
+        self.memory = LRUCache(max_bytes=max_bytes, sizeof=lambda entry: len(entry.data))
+        self.disk = DiskCache(disk_path, max_bytes=disk_max_bytes) if disk_path else None
+        self.inflight = SingleFlight()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bytes_saved = 0
+
+    async def get(self, url: str):
+        entry = self.memory.get(url)
+
+        if not entry and self.disk:
+            try:
+                raw = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    self.disk.get,
+                    url
+                )
+            except OSError as e:
+                logging.error(f'HttpCache failed to read from the disk cache: {type(e).__name__}: {e}')
+                raw = None
+
+            if raw:
+                entry = HttpCacheEntry.deserialize(raw)
+                self.memory.put(url, entry)
+                self.disk_hits += 1
+
+        return entry
+
+    async def put(self, url: str, entry: HttpCacheEntry):
+        self.memory.put(url, entry)
+
+        if self.disk:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    self.disk.put,
+                    url,
+                    entry.serialize()
+                )
+            except OSError as e:
+                logging.error(f'HttpCache failed to write to the disk cache: {type(e).__name__}: {e}')
+
+    # @NOTE:
+    # Requisições simultâneas com a mesma chave compartilham uma única chamada de fetch (coalescing),
+    # quem chegar depois só aguarda o resultado da primeira.
+    async def coalesce(self, key, fetch: callable):
+        if key in self.inflight:
+            self.coalesced += 1
+
+        return await self.inflight.run(key, fetch)
+
+    def get_hit_ratio(self):
+        total = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / total if total else 0
+
+    def format_statistics(self):
+        text = f'**HttpCache** memória: {len(self.memory)} arquivo(s), {bytes_string(self.memory.curr_bytes)}'
+
+        if self.disk and self.disk.index is not None:
+            text += f' | disco: {len(self.disk.index)} arquivo(s), {bytes_string(self.disk.curr_bytes)}'
+
+        text += f'\nacertos: {self.hits} (disco: {self.disk_hits}) | revalidados (304): {self.revalidated} | falhas: {self.misses} | agrupados: {self.coalesced} | taxa de acerto: {self.get_hit_ratio() * 100:.1f}% | economizado: {bytes_string(self.bytes_saved)}\n'
+        return text
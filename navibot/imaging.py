@@ -0,0 +1,700 @@
+import asyncio
+import hashlib
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import logging
+import mmap
+import math
+import time
+import os
+import io
+import PIL.Image
+import PIL.ImageFont
+import PIL.ImageDraw
+import PIL.ImageFilter
+
+from navibot.errors import BotError, CommandError
+from navibot.helpers import LRUCache
+from navibot.util import normalize_image_max_size, normalize_image_fit_into, normalize_image_format, bytes_string
+
+# @NOTE:
+# Registro dos assets (imagens e fontes de repo/) de um processo de renderização, cada asset só é carregado
+# no primeiro uso e é compartilhado por todos os comandos. Como somente modules/ é recarregado pelo hotreload,
+# este módulo (e os processos do RenderEngine) não são, então nada é carregado novamente após um reload.
+# As variações derivadas de um asset (Ex: a faixa do triggered redimensionada para uma largura) dependem da entrada,
+# por isso ficam em um LRU separado. Nenhum asset ou variação pode ser alterado por quem o recebe.
+class AssetRegistry:
+    def __init__(self, max_variants: int=64):
+        self.curr_path = None
+        self.assets = {}
+        self.variants = LRUCache(max_items=max_variants)
+
+    def get(self, key: tuple, load: callable):
+        try:
+            return self.assets[key]
+        except KeyError:
+            asset = load()
+            self.assets[key] = asset
+            return asset
+
+    def get_variant(self, key: tuple, derive: callable):
+        variant = self.variants.get(key)
+
+        if variant is None:
+            variant = derive()
+            self.variants.put(key, variant)
+
+        return variant
+
+    def load_image(self, path: str):
+        img = PIL.Image.open(os.path.join(self.curr_path, path))
+        img.load()
+        return img
+
+    def load_font(self, path: str, size: int):
+        return PIL.ImageFont.truetype(os.path.join(self.curr_path, path), size=size)
+
+# @NOTE:
+# Tudo que está neste módulo até o RenderEngine roda dentro dos processos de renderização,
+# por isso são funções de módulo (precisam ser "picklable") e cada processo tem o seu próprio registro de assets.
+worker_assets = AssetRegistry()
+worker_profile_covers = LRUCache(max_items=16)
+worker_profile_bases = LRUCache(max_items=32)
+
+def init_worker(curr_path: str):
+    worker_assets.curr_path = curr_path
+
+def get_asset_image(path: str):
+    return worker_assets.get(('image', path), lambda: worker_assets.load_image(path))
+
+def get_asset_font(path: str, size: int):
+    return worker_assets.get(('font', path, size), lambda: worker_assets.load_font(path, size))
+
+def get_asset_variant(path: str, name: str, args: tuple, derive: callable):
+    return worker_assets.get_variant((path, name, args), lambda: derive(get_asset_image(path), *args))
+
+# @NOTE:
+# As imagens atravessam o limite entre processos como (mode, size, bytes), sem precisar
+# codificar e decodificar PNG no caminho, modos com paleta são convertidos antes.
+def encode_image_payload(img: PIL.Image.Image):
+    if not img.mode in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert(mode='RGBA')
+
+    return (img.mode, img.size, img.tobytes())
+
+def decode_image_payload(payload: tuple):
+    mode, size, data = payload
+    return PIL.Image.frombytes(mode, size, data)
+
+def save_image(img: PIL.Image.Image, format: str, **kwargs):
+    output = io.BytesIO()
+    img.save(output, format=format.upper(), **kwargs)
+    return output.getvalue()
+
+# Qualidades tentadas pelos formatos com perda, da melhor para a pior, antes de reduzir a imagem.
+ENCODER_QUALITY_STEPS = (85, 70, 50)
+# Quantas vezes a imagem pode ser reduzida (75% cada) para caber no limite de bytes.
+ENCODER_MAX_DOWNSCALES = 4
+
+def has_transparency(img: PIL.Image.Image):
+    return 'A' in img.getbands() and img.getchannel('A').getextrema()[0] < 255
+
+def is_flat_image(img: PIL.Image.Image):
+    # Arte "chapada" (poucas cores), getcolors desiste assim que passar de 256 cores.
+    return img.getcolors(maxcolors=256) is not None
+
+def get_encoder_steps(img: PIL.Image.Image, format: str):
+    if format == 'png':
+        if is_flat_image(img):
+            # PNG com paleta, até 4x menor que RGBA e sem perda nenhuma nesse caso.
+            if has_transparency(img):
+                img = img.quantize(colors=256, method=PIL.Image.Quantize.FASTOCTREE)
+            else:
+                img = img.convert(mode='RGB').convert(mode='P', palette=PIL.Image.Palette.ADAPTIVE, colors=256)
+
+        return img, ({'optimize': True}, )
+    elif format == 'jpeg':
+        if has_transparency(img):
+            flat = PIL.Image.new('RGB', img.size, (255, 255, 255))
+            flat.paste(img, mask=img.getchannel('A'))
+            img = flat
+        elif img.mode != 'RGB':
+            img = img.convert(mode='RGB')
+
+        return img, tuple({'quality': q, 'optimize': True, 'progressive': True} for q in ENCODER_QUALITY_STEPS)
+    elif format == 'webp':
+        return img, tuple({'quality': q, 'method': 4} for q in ENCODER_QUALITY_STEPS)
+
+    return img, ({}, )
+
+# @NOTE:
+# Etapa de codificação compartilhada por todos os comandos de imagem, com o formato "auto"
+# escolhe o formato pelo conteúdo: PNG com paleta para arte chapada, WebP para fotos com transparência e JPEG para as demais.
+# Caso max_bytes seja informado, a qualidade é reduzida e depois a própria imagem até caber no limite.
+# Retorna (bytes, formato utilizado).
+def encode_output_image(img: PIL.Image.Image, format: str, max_bytes: int=0):
+    format = normalize_image_format(format)
+
+    if format == 'auto':
+        if is_flat_image(img):
+            format = 'png'
+        elif has_transparency(img):
+            format = 'webp'
+        else:
+            format = 'jpeg'
+
+    for i in range(ENCODER_MAX_DOWNSCALES + 1):
+        if i > 0:
+            img = img.resize((max(1, math.floor(img.width * .75)), max(1, math.floor(img.height * .75))))
+
+        prepared, steps = get_encoder_steps(img, format)
+
+        for settings in steps:
+            data = save_image(prepared, format, **settings)
+
+            if not max_bytes or len(data) <= max_bytes:
+                return data, format
+
+    raise BotError(f'A imagem gerada ultrapassa o limite de {bytes_string(max_bytes)} mesmo após ser reduzida.')
+
+def encode_output(payload: tuple, format: str, max_bytes: int=0):
+    return encode_output_image(decode_image_payload(payload), format, max_bytes)
+
+def get_text_width(draw: PIL.ImageDraw.ImageDraw, text: str, font):
+    # textsize não existe mais nas versões recentes do Pillow.
+    if hasattr(draw, 'textsize'):
+        return draw.textsize(text, font=font)[0]
+
+    return draw.textlength(text, font=font)
+
+def run_timed(func: callable, args: tuple):
+    stamp = time.perf_counter()
+    ret = func(*args)
+    return ret, time.perf_counter() - stamp
+
+# @NOTE:
+# Tabela de lookup do filtro "vermelho" (uma por banda RGBA), gera exatamente os mesmos valores
+# do antigo loop por pixel, mas quem aplica é o Image.point, em C.
+def create_triggered_lut(red_factor: float, suppress_factor: float):
+    lut = [min(255, math.floor(v * red_factor)) for v in range(256)]
+    lut += [math.ceil(v * suppress_factor) for v in range(256)] * 2
+    lut += list(range(256))
+    return lut
+
+def get_triggered_lut(red_factor: float, suppress_factor: float):
+    return worker_assets.get(('triggered_lut', red_factor, suppress_factor), lambda: create_triggered_lut(red_factor, suppress_factor))
+
+def resize_to_width(img: PIL.Image.Image, width: int):
+    factor = width / img.width
+
+    return img.resize((
+        math.floor(img.width * factor),
+        math.floor(img.height * factor)
+    ))
+
+# Deslocamento de cada frame do modo animado, em múltiplos da amplitude.
+TRIGGERED_SHAKE_OFFSETS = ((-1, -1), (1, 0), (-1, 1), (1, -1), (0, 1), (1, 1), (-1, 0), (0, -1))
+
+def render_triggered(payload: tuple, max_size: int, red_factor: float, suppress_factor: float, animated: bool=False):
+    curr_img = normalize_image_max_size(decode_image_payload(payload).convert(mode='RGBA'), max_size)
+    # @NOTE:
+    # 1. Redimensionar trigered_image_copy para que tenha a mesma largura que curr_img
+    # 2. Aplicar filtro "vermelho" sobre curr_img
+    # 3. Aplicar trigered_image_copy sobre curr_img, alinhando ao canto inferior
+    curr_img = curr_img.point(get_triggered_lut(red_factor, suppress_factor))
+
+    trigered_image_copy = get_asset_variant('repo/std/triggered.png', 'width', (curr_img.width, ), resize_to_width)
+
+    if not animated:
+        curr_img.paste(
+            trigered_image_copy,
+            (0, curr_img.height - trigered_image_copy.height)
+        )
+
+        return encode_image_payload(curr_img)
+
+    # @NOTE:
+    # Modo animado, a imagem (já filtrada uma única vez) é ampliada e cada frame é um recorte deslocado dela,
+    # a faixa "triggered" fica fixa no canto inferior.
+    amplitude = max(1, math.floor(min(curr_img.width, curr_img.height) * .04))
+    enlarged = curr_img.resize((curr_img.width + amplitude * 2, curr_img.height + amplitude * 2))
+    frames = []
+
+    for dx, dy in TRIGGERED_SHAKE_OFFSETS:
+        frame = enlarged.crop((
+            amplitude + dx * amplitude,
+            amplitude + dy * amplitude,
+            amplitude + dx * amplitude + curr_img.width,
+            amplitude + dy * amplitude + curr_img.height
+        ))
+
+        frame.paste(
+            trigered_image_copy,
+            (0, frame.height - trigered_image_copy.height)
+        )
+
+        frames.append(frame.convert(mode='RGB'))
+
+    return save_image(frames[0], 'GIF', save_all=True, append_images=frames[1:], duration=40, loop=0)
+
+def render_thinking(payload: tuple, max_size: int):
+    curr_img = normalize_image_max_size(decode_image_payload(payload).convert(mode='RGBA'), max_size)
+    thinking_image_copy = get_asset_variant('repo/std/thinkinghand.png', 'max_size', (math.floor(curr_img.height / 2), ), normalize_image_max_size)
+
+    curr_img.paste(
+        thinking_image_copy,
+        (math.floor(curr_img.width / 2 - thinking_image_copy.height / 2), curr_img.height - thinking_image_copy.height),
+        thinking_image_copy
+    )
+
+    return encode_image_payload(curr_img)
+
+def render_frames(func: callable, payloads: list, args: tuple):
+    return [func(payload, *args) for payload in payloads]
+
+# @NOTE:
+# Codifica os frames de uma animação em um GIF com uma única paleta compartilhada (gerada a partir de alguns frames
+# espalhados pela animação), evitando que cada frame tenha a sua própria paleta e a imagem "pisque".
+def encode_animation(payloads: list, durations: list, loop: int):
+    frames = [decode_image_payload(payload).convert(mode='RGBA') for payload in payloads]
+    transparent = any(has_transparency(frame) for frame in frames)
+
+    samples = frames[::max(1, len(frames) // 8)][:8]
+    montage = PIL.Image.new('RGB', (max(f.width for f in samples), sum(f.height for f in samples)))
+    y = 0
+
+    for frame in samples:
+        montage.paste(frame.convert(mode='RGB'), (0, y))
+        y += frame.height
+
+    # O último índice fica reservado para a transparência.
+    palette = montage.quantize(colors=255 if transparent else 256, method=PIL.Image.Quantize.MEDIANCUT)
+    output = []
+
+    for frame in frames:
+        q = frame.convert(mode='RGB').quantize(palette=palette)
+
+        if transparent:
+            q.paste(255, mask=frame.getchannel('A').point(lambda a: 255 if a < 128 else 0))
+
+        output.append(q)
+
+    kwargs = {'transparency': 255, 'disposal': 2} if transparent else {}
+    return save_image(output[0], 'GIF', save_all=True, append_images=output[1:], duration=durations, loop=loop, optimize=False, **kwargs)
+
+def render_profile_cover(payload: tuple, max_size: int):
+    return save_image(normalize_image_max_size(decode_image_payload(payload).convert(mode='RGB'), max_size), 'JPEG')
+
+def load_profile_cover(path: str):
+    # Os blobs são endereçados pelo conteúdo, o mesmo caminho sempre representa a mesma imagem.
+    cover = worker_profile_covers.get(path)
+
+    if not cover:
+        try:
+            # O mmap é lido diretamente pelo PIL, sem copiar o arquivo para um BytesIO antes.
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                img = PIL.Image.open(mm)
+                img.load()
+                cover = img.convert(mode='RGBA')
+        except (OSError, ValueError) as e:
+            logging.error(f'load_profile_cover failed to load blob {path}: {type(e).__name__}: {e}')
+            return None
+
+        worker_profile_covers.put(path, cover)
+
+    return cover
+
+# @NOTE:
+# Camadas estáticas do perfil (plano de fundo, template e avatar), dependem somente do avatar e da imagem de fundo,
+# ficam em cache para que uma mudança de EXP só precise desenhar a barra e os textos novamente.
+def create_profile_base(avatar_data: bytes, cover_path: str, max_avatar_size: int):
+    key = (hashlib.sha1(avatar_data).digest(), cover_path, max_avatar_size)
+    profile_base = worker_profile_bases.get(key)
+
+    if profile_base:
+        return profile_base
+
+    profile_template_fl = get_asset_image('repo/profile/profile-template-fl.png')
+
+    try:
+        profile_avatar = PIL.Image.open(io.BytesIO(avatar_data))
+        profile_avatar.load()
+    except Exception:
+        raise CommandError('Não foi possível abrir a imagem a partir dos dados recebidos.')
+
+    profile_avatar = normalize_image_max_size(profile_avatar.convert(mode='RGBA'), max_avatar_size)
+    profile_base = PIL.Image.new(mode='RGBA', size=(profile_template_fl.width, profile_template_fl.height), color=(255, 255, 255, 255))
+    profile_background = load_profile_cover(cover_path) if cover_path else None
+    profile_background = profile_background if profile_background else profile_avatar.filter(PIL.ImageFilter.BoxBlur(3))
+
+    # Aplicando o plano de fundo
+    profile_base.paste(
+        normalize_image_fit_into(profile_background if profile_background.mode == 'RGBA' else profile_background.convert(mode='RGBA'), profile_base.width, profile_base.height),
+        (
+            0,
+            0
+        )
+    )
+
+    # Aplicando primeira camada do design do perfil
+    profile_base.paste(
+        profile_template_fl,
+        (
+            0,
+            0
+        ),
+        profile_template_fl
+    )
+
+    # Colando o avatar no perfil
+    profile_base.paste(
+        profile_avatar,
+        # 120 + 10 border
+        (
+            math.floor(120 / 2 + 10 - profile_avatar.width / 2),
+            math.floor(120 / 2 + 10 - profile_avatar.height / 2)
+        )
+    )
+
+    worker_profile_bases.put(key, profile_base)
+    return profile_base
+
+def render_profile(avatar_data: bytes, cover_path: str, name: str, level: int, exp: int, exp_ceil: int, xp_factor: float, max_avatar_size: int, format: str, max_bytes: int=0):
+    profile_template_xpbar_full = get_asset_image('repo/profile/profile-template-xpbar-full.png')
+    font_raleway_bold = get_asset_font('repo/font/Raleway-Bold.ttf', 30)
+    font_sourcecodepro_bold = get_asset_font('repo/font/SourceCodePro-Bold.otf', 18)
+
+    profile_base = create_profile_base(avatar_data, cover_path, max_avatar_size).copy()
+
+    # Colando a barra de EXP
+    profile_base.paste(
+        profile_template_xpbar_full.crop(
+            (
+                0,
+                0,
+                math.floor(profile_template_xpbar_full.width * xp_factor),
+                profile_template_xpbar_full.height - 1
+            )
+        ),
+        # Em x: 10, y: 185
+        (
+            10,
+            185
+        )
+    )
+
+    draw = PIL.ImageDraw.Draw(profile_base)
+
+    # Escrevendo nome do usuário
+    draw.text(
+        (
+            140,
+            100 - font_raleway_bold.size - 10
+        ),
+        name,
+        fill=(255, 255, 255, 255),
+        font=font_raleway_bold,
+        stroke_width=1,
+        stroke_fill=(50, 50, 50, 255)
+    )
+
+    # Escrevendo nível atual
+    level_str = str(level)
+    draw.text(
+        (
+            120 / 2 - get_text_width(draw, level_str, font_raleway_bold) / 2 + 10,
+            140
+        ),
+        level_str,
+        fill=(145, 81, 213),
+        font=font_raleway_bold
+    )
+
+    # Escrevendo progresso de EXP
+    progress_str = f'{exp}/{exp_ceil} XP'
+    draw.text(
+        (
+            390 - get_text_width(draw, progress_str, font_sourcecodepro_bold),
+            160
+        ),
+        progress_str,
+        fill=(7, 194, 119),
+        font=font_sourcecodepro_bold
+    )
+
+    return encode_output_image(profile_base, format, max_bytes)
+
+# @NOTE:
+# Lê os frames de uma imagem animada (GIF/WebP) aos poucos, já redimensionados para max_size.
+# Caso a animação ultrapasse max_frames ou max_pixels (somando todos os frames), somente um a cada step frames é mantido,
+# e o frame mantido fica na tela pelo tempo dos frames descartados.
+# Roda fora do event loop (executor padrão), um lote por vez.
+class AnimationReader:
+    def __init__(self, img: PIL.Image.Image, max_size: int, max_frames: int, max_pixels: int):
+        self.img = img
+        self.max_size = max_size
+        self.total = img.n_frames
+        self.loop = img.info.get('loop', 0)
+
+        frame_pixels = min(img.width * img.height, max_size * max_size)
+        allowed = max(1, min(max_frames, max_pixels // frame_pixels))
+
+        self.step = math.ceil(self.total / allowed)
+        self.indices = range(0, self.total, self.step)
+        self.position = 0
+
+    def __len__(self):
+        return len(self.indices)
+
+    def read_batch(self, count: int):
+        payloads = []
+        durations = []
+
+        for index in self.indices[self.position:self.position + count]:
+            self.img.seek(index)
+            frame = normalize_image_max_size(self.img.convert(mode='RGBA'), self.max_size)
+            payloads.append(encode_image_payload(frame))
+            # Navegadores e o próprio discord tratam durações muito curtas como 100 ms.
+            durations.append(max(20, self.img.info.get('duration', 100) * self.step))
+
+        self.position += count
+        return payloads, durations
+
+class RenderStatistics:
+    __slots__ = ('name', 'calls', 'failures', 'total_time', 'worker_time', 'max_time')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.worker_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float, worker_elapsed: float):
+        self.calls += 1
+        self.total_time += elapsed
+        self.worker_time += worker_elapsed
+
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+# @NOTE:
+# Executa as funções de renderização acima em um ProcessPoolExecutor dedicado, assim o trabalho do PIL
+# não disputa o GIL com o event loop nem ocupa o executor padrão (parser, youtube_dl...).
+# Com workers = 0, utiliza o executor padrão dentro do próprio processo.
+class RenderEngine:
+    def __init__(self, curr_path: str, workers: int=0):
+        self.curr_path = curr_path
+        self.workers = workers
+        self.executor = None
+        self.statistics = {}
+        self.pending = 0
+        self.max_pending = 0
+
+        # No modo sem processos, as funções rodam aqui mesmo e precisam saber onde estão os arquivos.
+        init_worker(curr_path)
+
+    def get_executor(self):
+        if not self.executor and self.workers > 0:
+            logging.info(f'RenderEngine is starting a process pool with {self.workers} worker(s)')
+
+            # spawn: os processos não herdam o event loop, os sockets do discord e nem os módulos carregados.
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(self.curr_path, )
+            )
+
+        return self.executor
+
+    def get_statistics(self, name: str):
+        try:
+            return self.statistics[name]
+        except KeyError:
+            st = RenderStatistics(name)
+            self.statistics[name] = st
+            return st
+
+    # Converte a imagem para o formato utilizado entre processos, fora do event loop.
+    async def create_payload(self, img: PIL.Image.Image):
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            encode_image_payload,
+            img
+        )
+
+    async def render(self, name: str, func: callable, *args):
+        st = self.get_statistics(name)
+        stamp = time.perf_counter()
+
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+
+        try:
+            ret, worker_elapsed = await asyncio.get_running_loop().run_in_executor(
+                self.get_executor(),
+                run_timed,
+                func,
+                args
+            )
+        except concurrent.futures.process.BrokenProcessPool as e:
+            st.failures += 1
+            logging.error(f'RenderEngine process pool is broken, recreating it on the next render: {e}')
+            self.shutdown()
+            raise BotError('O processo de renderização foi encerrado inesperadamente, por favor tente novamente.')
+        except Exception as e:
+            st.failures += 1
+            raise e
+        finally:
+            self.pending -= 1
+
+        st.record(time.perf_counter() - stamp, worker_elapsed)
+        return ret
+
+    # @NOTE:
+    # Renderiza cada frame da animação com func (mesma assinatura das funções de imagem estática), em lotes distribuídos
+    # entre os processos, o próximo lote é lido enquanto os anteriores já estão sendo renderizados.
+    async def render_animation(self, name: str, reader: AnimationReader, func: callable, *args):
+        loop = asyncio.get_running_loop()
+        batch_size = max(1, math.ceil(len(reader) / (max(1, self.workers) * 2)))
+        durations = []
+        tasks = []
+
+        try:
+            while True:
+                payloads, batch_durations = await loop.run_in_executor(
+                    None,
+                    reader.read_batch,
+                    batch_size
+                )
+
+                if not payloads:
+                    break
+
+                durations.extend(batch_durations)
+                tasks.append(asyncio.ensure_future(self.render(name, render_frames, func, payloads, args)))
+
+            frames = [frame for batch in await asyncio.gather(*tasks) for frame in batch]
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+
+            raise e
+
+        return await self.render('encode_animation', encode_animation, frames, durations, reader.loop)
+
+    async def encode(self, name: str, payload: tuple, format: str, max_bytes: int=0):
+        data, format = await self.render(name, encode_output, payload, format, max_bytes)
+        logging.debug(f'RenderEngine encoded {name} {payload[1][0]}x{payload[1][1]} {payload[0]} as {format}: {bytes_string(len(payload[2]))} -> {bytes_string(len(data))}')
+        return data, format
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def reset(self):
+        self.statistics.clear()
+        self.max_pending = 0
+
+    def format_statistics(self):
+        text = f'**RenderEngine** ({self.workers} processo(s)) | na fila: {self.pending} | pico na fila: {self.max_pending}\n\n'
+
+        if not self.statistics:
+            return text + 'Nenhuma renderização foi registrada até o momento.'
+
+        for st in sorted(self.statistics.values(), key=lambda x: x.total_time, reverse=True):
+            if st.calls:
+                text += f'`{st.name}` chamadas: {st.calls} | falhas: {st.failures} | média: {st.total_time / st.calls * 1000:.1f} ms | renderizando: {st.worker_time / st.calls * 1000:.1f} ms | esperando: {(st.total_time - st.worker_time) / st.calls * 1000:.1f} ms | max: {st.max_time * 1000:.1f} ms\n'
+            else:
+                text += f'`{st.name}` chamadas: 0 | falhas: {st.failures}\n'
+
+        return text
+
+# @NOTE:
+# Imagem que trafega pela PIPELINE entre comandos de imagem (Ex: ;triggered @prtx | thinking), ainda decodificada,
+# assim o próximo comando não precisa decodificar o que o anterior acabou de codificar.
+# Só é codificada uma única vez, quando realmente for enviada (BotContext.reply).
+# Resultados que já nascem codificados (Ex: GIF animado) guardam apenas os bytes em data.
+class ImageValue:
+    def __init__(self, name: str, format: str, payload: tuple=None, data: bytes=None):
+        assert payload is not None or data is not None
+        self.name = name
+        self.format = format
+        self.payload = payload
+        self.data = data
+        self.digest = None
+        # Chamado com esta imagem logo após ela ser codificada (Ex: ImageResultCache).
+        self.on_encoded = None
+
+    def get_filename(self):
+        return f'{self.name}.{self.format}'
+
+    def get_digest(self):
+        if self.digest is None:
+            if self.payload is not None:
+                mode, size, data = self.payload
+                self.digest = hashlib.sha1(f'{mode}:{size[0]}x{size[1]}:'.encode('utf-8') + data).digest()
+            else:
+                self.digest = hashlib.sha1(self.data).digest()
+
+        return self.digest
+
+    def get_image(self):
+        return decode_image_payload(self.payload) if self.payload is not None else None
+
+    async def get_data(self, renderer: RenderEngine, max_bytes: int=0):
+        if self.data is None:
+            # Com o formato "auto" o formato final só é conhecido depois de codificar.
+            self.data, self.format = await renderer.encode('encode', self.payload, self.format, max_bytes)
+
+            if self.on_encoded:
+                self.on_encoded(self)
+
+        return self.data
+
+# @NOTE:
+# Resultados (já codificados) dos comandos de imagem, indexados por (comando, variação, hash da imagem de entrada),
+# como a imagem é identificada pelo conteúdo, a mesma imagem passando várias vezes pelo mesmo comando
+# (Ex: vários membros usando triggered no mesmo avatar) não é decodificada e nem renderizada novamente.
+# Só entra no cache o que realmente foi codificado, resultados intermediários da PIPELINE não ocupam espaço.
+class ImageResultCache:
+    def __init__(self, max_bytes: int):
+        self.cache = LRUCache(max_bytes=max_bytes, sizeof=lambda entry: len(entry[1]))
+
+    @staticmethod
+    def get_source_digest(source):
+        if isinstance(source, ImageValue):
+            return source.get_digest()
+
+        with source.getbuffer() as view:
+            return hashlib.sha1(view).digest()
+
+    def get(self, key: tuple, name: str):
+        entry = self.cache.get(key)
+
+        if not entry:
+            return None
+
+        format, data = entry
+        return ImageValue(name, format, data=data)
+
+    def track(self, key: tuple, value: ImageValue):
+        if value.data is not None:
+            self.cache.put(key, (value.format, value.data))
+        else:
+            value.on_encoded = lambda v: self.cache.put(key, (v.format, v.data))
+
+        return value
+
+    def reset(self):
+        self.cache.hits = 0
+        self.cache.misses = 0
+
+    def format_statistics(self):
+        total = self.cache.hits + self.cache.misses
+        ratio = self.cache.hits / total * 100 if total else 0
+        return f'**ImageResultCache** {len(self.cache)} resultado(s), {bytes_string(self.cache.curr_bytes)} | acertos: {self.cache.hits} | falhas: {self.cache.misses} | taxa de acerto: {ratio:.1f}%\n'
@@ -0,0 +1,261 @@
+import random
+import time
+
+class SkipNode:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next = [None] * level
+        # Quantas posições existem entre este nó e o próximo em cada nível.
+        self.width = [1] * level
+
+# @NOTE:
+# Skip list indexável (ordenada pela chave), além de inserir e remover em O(log n),
+# permite saber a posição de uma chave e acessar o n-ésimo elemento também em O(log n).
+class IndexableSkipList:
+    MAX_LEVEL = 24
+
+    def __init__(self):
+        self.head = SkipNode(None, self.MAX_LEVEL)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.head.next[0]
+
+        while node:
+            yield node.key
+            node = node.next[0]
+
+    @classmethod
+    def random_level(cls):
+        level = 1
+
+        while level < cls.MAX_LEVEL and random.random() < 0.5:
+            level += 1
+
+        return level
+
+    def insert(self, key):
+        update = [None] * self.MAX_LEVEL
+        steps = [0] * self.MAX_LEVEL
+        node = self.head
+        pos = 0
+
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] and node.next[i].key < key:
+                pos += node.width[i]
+                node = node.next[i]
+
+            update[i] = node
+            steps[i] = pos
+
+        level = self.random_level()
+        new = SkipNode(key, level)
+
+        for i in range(self.MAX_LEVEL):
+            if i < level:
+                new.next[i] = update[i].next[i]
+                update[i].next[i] = new
+                new.width[i] = update[i].width[i] - (pos - steps[i])
+                update[i].width[i] = pos - steps[i] + 1
+            else:
+                update[i].width[i] += 1
+
+        self.size += 1
+
+    def remove(self, key):
+        update = [None] * self.MAX_LEVEL
+        node = self.head
+
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] and node.next[i].key < key:
+                node = node.next[i]
+
+            update[i] = node
+
+        target = update[0].next[0]
+
+        if not target or target.key != key:
+            raise KeyError(key)
+
+        for i in range(self.MAX_LEVEL):
+            if update[i].next[i] is target:
+                update[i].width[i] += target.width[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].width[i] -= 1
+
+        self.size -= 1
+
+    # Posição (começando em 0) da chave informada, None caso ela não exista.
+    def index_of(self, key):
+        node = self.head
+        pos = 0
+
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] and node.next[i].key < key:
+                pos += node.width[i]
+                node = node.next[i]
+
+        node = node.next[0]
+        return pos if node and node.key == key else None
+
+    # Retorna até count chaves a partir da posição start (começando em 0).
+    def slice(self, start: int, count: int):
+        if start < 0 or start >= self.size or count <= 0:
+            return []
+
+        node = self.head
+        remaining = start + 1
+
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] and node.width[i] <= remaining:
+                remaining -= node.width[i]
+                node = node.next[i]
+
+        out = []
+        while node and len(out) < count:
+            out.append(node.key)
+            node = node.next[0]
+
+        return out
+
+# @NOTE:
+# Ranking de pontuações por membro, ordenado da maior pontuação para a menor (em empate, pelo menor id),
+# a chave interna é (-pontuação, id) justamente para que a ordem natural da skip list seja a do ranking.
+class Leaderboard:
+    def __init__(self):
+        self.scores = {}
+        self.index = IndexableSkipList()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, memid: int):
+        return memid in self.scores
+
+    def get_score(self, memid: int, default=None):
+        return self.scores.get(memid, default)
+
+    def update(self, memid: int, score: int):
+        prev = self.scores.get(memid, None)
+
+        if prev == score:
+            return
+
+        if prev is not None:
+            self.index.remove((-prev, memid))
+
+        self.index.insert((-score, memid))
+        self.scores[memid] = score
+
+    def add(self, memid: int, delta: int):
+        self.update(memid, self.scores.get(memid, 0) + delta)
+
+    def remove(self, memid: int):
+        prev = self.scores.pop(memid, None)
+
+        if prev is not None:
+            self.index.remove((-prev, memid))
+
+    def clear(self):
+        self.scores.clear()
+        self.index = IndexableSkipList()
+
+    # Posição no ranking começando em 1, None se o membro não estiver no ranking.
+    def get_rank(self, memid: int):
+        score = self.scores.get(memid, None)
+
+        if score is None:
+            return None
+
+        return self.index.index_of((-score, memid)) + 1
+
+    # Retorna uma lista de (posição, id, pontuação) a partir da posição start (começando em 0).
+    def get_page(self, start: int, count: int):
+        return [
+            (start + i + 1, memid, -score)
+            for i, (score, memid) in enumerate(self.index.slice(start, count))
+        ]
+
+# @NOTE:
+# Ranking de uma janela de tempo deslizante (Ex: últimas 24 horas), a janela é um ring buffer
+# de bucket_count buckets de bucket_seconds segundos cada, cada bucket guarda somente os membros
+# que pontuaram naquele intervalo. O total da janela fica em um Leaderboard, quando um bucket sai
+# da janela, seus valores são subtraídos do total, portanto nunca somamos a janela inteira novamente.
+class WindowedLeaderboard:
+    def __init__(self, bucket_seconds: int, bucket_count: int):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.buckets = [None] * bucket_count
+        self.totals = Leaderboard()
+        self.current = -1
+
+    def __len__(self):
+        self.advance(self.get_bucket_id(time.time()))
+        return len(self.totals)
+
+    def get_bucket_id(self, timestamp: float):
+        return int(timestamp // self.bucket_seconds)
+
+    def expire_slot(self, slot: int):
+        bucket = self.buckets[slot]
+
+        if bucket:
+            for memid, value in bucket.items():
+                remaining = self.totals.get_score(memid, 0) - value
+
+                if remaining > 0:
+                    self.totals.update(memid, remaining)
+                else:
+                    self.totals.remove(memid)
+
+        self.buckets[slot] = None
+
+    def advance(self, bucket_id: int):
+        if bucket_id <= self.current:
+            return
+
+        # Se passamos mais tempo do que a janela inteira, todos os slots são expirados uma única vez.
+        for b in range(max(self.current + 1, bucket_id - self.bucket_count + 1), bucket_id + 1):
+            self.expire_slot(b % self.bucket_count)
+
+        self.current = bucket_id
+
+    def add(self, memid: int, value: int, timestamp: float=None):
+        bucket_id = self.get_bucket_id(timestamp if timestamp is not None else time.time())
+        self.advance(bucket_id)
+
+        # Fora da janela atual, não tem mais relevância.
+        if bucket_id <= self.current - self.bucket_count:
+            return
+
+        slot = bucket_id % self.bucket_count
+
+        if self.buckets[slot] is None:
+            self.buckets[slot] = {}
+
+        bucket = self.buckets[slot]
+        bucket[memid] = bucket.get(memid, 0) + value
+        self.totals.add(memid, value)
+
+    def clear(self):
+        self.buckets = [None] * self.bucket_count
+        self.totals.clear()
+        self.current = -1
+
+    def get_score(self, memid: int, default=None):
+        self.advance(self.get_bucket_id(time.time()))
+        return self.totals.get_score(memid, default)
+
+    def get_rank(self, memid: int):
+        self.advance(self.get_bucket_id(time.time()))
+        return self.totals.get_rank(memid)
+
+    def get_page(self, start: int, count: int):
+        self.advance(self.get_bucket_id(time.time()))
+        return self.totals.get_page(start, count)
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import random
+import time
+
+from email.utils import parsedate_to_datetime
+
+from navibot.helpers import TokenBucket
+
+def get_header_float(headers, name: str):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+# Retry-After pode vir em segundos ou como uma data HTTP.
+def get_retry_after(headers):
+    value = headers.get('Retry-After', None)
+
+    if value is None:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# X-RateLimit-Reset pode ser um timestamp unix (AniList, GitHub) ou a quantidade de segundos restantes.
+def get_ratelimit_reset(headers):
+    value = get_header_float(headers, 'X-RateLimit-Reset-After')
+
+    if value is not None:
+        return max(0, value)
+
+    value = get_header_float(headers, 'X-RateLimit-Reset')
+
+    if value is None:
+        return None
+
+    return max(0, value - time.time()) if value > 1e9 else max(0, value)
+
+class HostRateLimit:
+    __slots__ = ('host', 'bucket', 'lock', 'blocked_until', 'waiting', 'requests', 'queued', 'wait_total', 'wait_max', 'throttled', 'retries', 'failures')
+
+    def __init__(self, host: str, rate: float, capacity: float):
+        self.host = host
+        self.bucket = TokenBucket(rate, capacity)
+        self.lock = asyncio.Lock()
+        self.blocked_until = 0
+        self.waiting = 0
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.queued = 0
+        self.wait_total = 0
+        self.wait_max = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+
+    def get_wait_time(self, now: float):
+        return max(self.blocked_until - now, self.bucket.get_wait_time(1, now))
+
+# @NOTE:
+# Limitador de requisições por host para os clientes de API (libs/), cada host tem o seu próprio TokenBucket (http.rate_limits).
+# - Requisições acima do limite esperam em fila (FIFO, através do lock do host) ao invés de falhar,
+#   somente se a espera passar de max_queue_seconds é que desistimos (asyncio.TimeoutError).
+# - Os headers Retry-After e X-RateLimit-* das respostas bloqueiam o host até o momento informado pelo servidor,
+#   e X-RateLimit-Remaining mantém o bucket local sincronizado com o que o servidor ainda aceita.
+# - Falhas temporárias são repetidas até max_retries vezes com backoff exponencial e jitter (get_backoff).
+class HostRateLimiter:
+    def __init__(self, limits: dict, max_retries: int=3, base_delay: float=0.5, max_delay: float=30, max_queue_seconds: float=60):
+        self.limits = limits
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_queue_seconds = max_queue_seconds
+        self.hosts = {}
+
+    def get_limit(self, host: str):
+        try:
+            return self.hosts[host]
+        except KeyError:
+            conf = self.limits.get(host, self.limits.get('default', {}))
+            limit = HostRateLimit(host, conf.get('rate', 5), conf.get('capacity', 10))
+            self.hosts[host] = limit
+            return limit
+
+    async def acquire(self, host: str):
+        limit = self.get_limit(host)
+        start = time.monotonic()
+        limit.requests += 1
+        limit.waiting += 1
+
+        try:
+            async with limit.lock:
+                while True:
+                    now = time.monotonic()
+                    wait = limit.get_wait_time(now)
+
+                    if wait <= 0:
+                        limit.bucket.consume(1, now)
+                        break
+
+                    if now + wait - start > self.max_queue_seconds:
+                        limit.failures += 1
+                        raise asyncio.TimeoutError(f'{host} would need to wait {now + wait - start:.1f}s')
+
+                    await asyncio.sleep(wait)
+        finally:
+            limit.waiting -= 1
+
+        waited = time.monotonic() - start
+
+        if waited > 0.001:
+            limit.queued += 1
+            limit.wait_total += waited
+            limit.wait_max = max(limit.wait_max, waited)
+
+        return waited
+
+    # Atualiza o estado do host com base na resposta, retorna o Retry-After (se houver).
+    def update(self, host: str, status: int, headers):
+        limit = self.get_limit(host)
+        now = time.monotonic()
+        retry_after = get_retry_after(headers)
+        reset = get_ratelimit_reset(headers)
+        remaining = get_header_float(headers, 'X-RateLimit-Remaining')
+
+        if remaining is not None:
+            limit.bucket.refill(now)
+            limit.bucket.tokens = min(limit.bucket.tokens, max(0, remaining))
+
+            if remaining < 1 and reset is not None:
+                limit.block(now + reset)
+
+        if status == 429:
+            limit.throttled += 1
+            delay = retry_after if retry_after is not None else reset
+
+            if delay is not None:
+                limit.block(now + delay)
+                logging.warning(f'HostRateLimiter, {host} is throttling requests, blocking it for {delay:.1f}s')
+
+            limit.bucket.tokens = 0
+        elif status == 503 and retry_after is not None:
+            limit.block(now + retry_after)
+
+        return retry_after
+
+    # Backoff exponencial com "full jitter", quando o servidor já informou quanto esperar o próprio acquire() aguarda o bloqueio.
+    def get_backoff(self, host: str, attempt: int, retry_after: float=None):
+        self.get_limit(host).retries += 1
+
+        if retry_after is not None:
+            return random.uniform(0, self.base_delay)
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def reset(self):
+        for limit in self.hosts.values():
+            limit.reset()
+
+    def format_statistics(self):
+        text = f'**HostRateLimiter** {len(self.hosts)} host(s)\n'
+
+        if not self.hosts:
+            return text + 'Nenhuma requisição de API foi limitada até o momento.\n'
+
+        for limit in sorted(self.hosts.values(), key=lambda x: x.host):
+            avg = limit.wait_total / limit.queued if limit.queued else 0
+            text += f'`{limit.host}` requisições: {limit.requests} | em fila agora: {limit.waiting} | esperaram: {limit.queued} (média: {avg:.2f}s, máx: {limit.wait_max:.2f}s) | limitadas (429): {limit.throttled} | repetidas: {limit.retries} | desistências: {limit.failures}\n'
+
+        return text
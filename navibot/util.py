@@ -152,3 +152,27 @@ def normalize_image_fit_into(img, width, height):
     else:
         return img
 
+# @NOTE:
+# Descobre o formato da imagem pelos primeiros bytes (magic bytes), sem precisar decodificar nada,
+# retorna None caso não seja nenhum dos formatos conhecidos.
+IMAGE_MAGIC_BYTES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp')
+)
+
+def sniff_image_format(head: bytes):
+    for magic, format in IMAGE_MAGIC_BYTES:
+        if head.startswith(magic):
+            return format
+
+    if len(head) >= 12 and head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+
+    return None
+
+def normalize_image_format(format: str):
+    format = format.lower()
+    return 'jpeg' if format == 'jpg' else format